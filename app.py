@@ -1,19 +1,24 @@
 # app.py
-from datetime import datetime
 from time import perf_counter
+_BOOT_TS = perf_counter()  # before Kivy imports: startup time is measured from here
+
+from datetime import datetime
+from uuid import uuid4
 import os
-import wave
-import struct
-import math
+import re
+import threading
+from collections import deque
 
+import asynckivy as ak
 from kivy.clock import Clock
+from kivy.logger import Logger
 from kivy.core.audio import SoundLoader
 from kivy.core.window import Window
+from kivy.factory import Factory
 from kivy.lang import Builder
 from kivy.metrics import dp
 from kivy.properties import (
     StringProperty,
-    DictProperty,
     ListProperty,
     NumericProperty,
     BooleanProperty,
@@ -21,13 +26,62 @@ from kivy.properties import (
 from kivy.uix.widget import Widget
 from kivy.uix.scrollview import ScrollView
 from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.image import AsyncImage
+from kivy.uix.modalview import ModalView
 from kivymd.uix.label import MDLabel
 from kivymd.app import MDApp
 from kivymd.uix.boxlayout import MDBoxLayout
+from kivymd.uix.menu import MDDropdownMenu
+from kivymd.uix.filemanager import MDFileManager
 
 from math import atan2, degrees
 
+from debug import profiler
+from debug.profiler import profiled
 from screens.notes_screen import NotesController
+from store.archive import LOAD_BATCH, ArchiveLoader, read_archive
+from store.attachments import AttachmentStore, markdown_ref, refs
+from store.nodes import FOLDER, Node
+from store.tree import NoteTree
+from store.previews import PreviewCache
+from store.titles import TitleIndex
+from store.aggregates import FolderAggregates
+from store.revisions import RevisionStore
+from store.sync import SyncClient, SyncTracker
+from store.undo import UndoManager, diff
+from editor.highlight import HighlightWorker
+from timing.group import TimerGroup
+from timing.programs import ProgramCache, ProgramRunner
+from timing.render import CUES, SessionRenderer, program_events, write_tone
+from screens.registry import APP_SCREENS, TIMER_MODES, ensure_screen
+from timing.clock import KivyClock
+from timing.engines import Countdown, Metronome, Stopwatch
+
+# Process start -> first drawn frame; exceeding it is logged as a warning
+STARTUP_BUDGET_MS = 1500
+
+# Delta sync runs only when a service URL is configured
+SYNC_URL_ENV = "RC_SYNC_URL"
+SYNC_INTERVAL_S = 30
+
+# Notes are read from this JSON archive (store.nodes.to_dict shape) if set
+ARCHIVE_ENV = "RC_ARCHIVE"
+# Startup fills the tree in per-frame slices sized to take about this long
+LOAD_FRAME_BUDGET_S = 0.006
+
+# A revision is committed after this much typing idle time, and on leaving a note
+REVISION_IDLE_S = 5.0
+
+# Workouts in the open note are recounted this long after typing stops
+PROGRAM_REPARSE_S = 0.5
+
+# Image links in the open note are rescanned after this much typing idle time
+ATTACH_RESCAN_S = 0.5
+# Thumbnail size in the note's attachment strip
+STRIP_THUMB_PX = 160
+
+# Undo history for all notes together; oldest steps are dropped beyond this
+UNDO_BUDGET_BYTES = 1024 * 1024
 
 # Dev window size
 Window.size = (320, 600)
@@ -180,6 +234,7 @@ class NumberWheel(ScrollView):
 
         self._snap_ev = Clock.schedule_interval(self._check_snap_ready, 0)
 
+    @profiled()
     def _check_snap_ready(self, dt):
         eff = getattr(self, "effect_y", None)
         if eff is None:
@@ -195,6 +250,7 @@ class NumberWheel(ScrollView):
         return True
 
     # ---------- internals ----------
+    @profiled()
     def _rebuild(self, *_):
         self._box.clear_widgets()
         if not self.values:
@@ -256,6 +312,7 @@ class NumberWheel(ScrollView):
         idx = int(round(y_rel / self.ROW_H))
         return max(0, min(len(self.values) - 1, idx))
 
+    @profiled()
     def _scroll_to_index(self, idx: int, animate=True):
         if not self._built:
             return
@@ -297,7 +354,6 @@ class RCApp(MDApp):
     # ======================================================
 
     # ---------- Files / Notes ----------
-    fs = DictProperty({})
     current_path = ListProperty([])
     sort_mode = StringProperty("date")
     sort_label = StringProperty("Date")
@@ -305,6 +361,14 @@ class RCApp(MDApp):
     open_note_id = StringProperty("")
     open_note_title = StringProperty("")
     open_note_body = StringProperty("")
+    select_mode = BooleanProperty(False)
+    can_undo = BooleanProperty(False)
+    can_redo = BooleanProperty(False)
+    note_preview = BooleanProperty(False)   # highlighted view instead of editor
+    note_programs = NumericProperty(0)      # workouts found in the open note
+    note_images = ListProperty([])          # attachment keys linked from the open note
+    selection_count = NumericProperty(0)
+    notes_loading = BooleanProperty(False)  # startup still filling the tree
 
     # ---------- Timer mode tab ----------
     timer_mode = StringProperty("metronome")
@@ -324,6 +388,7 @@ class RCApp(MDApp):
     timer_state = StringProperty("setup")
     timer_display = StringProperty("00:00")        # center label text
     timer_progress = NumericProperty(0.0)          # 1.0 -> 0.0
+    program_step = StringProperty("")              # "2/9 · planche hold" in a program
 
     # ---------- Stopwatch (ADD: properties used by KV) ----------
     sw_running = BooleanProperty(False)
@@ -334,24 +399,66 @@ class RCApp(MDApp):
     # ===============  INTERNAL FIELDS (NON-KV) ===========
     # ======================================================
 
-    # Timer internals
-    _timer_event = None
-    _timer_remaining = 0.0
-    _timer_set_seconds = 0
-    _timer_last_ts = None
-    _timer_beep = None
+    # Id-indexed tree of store.nodes.Node (store.tree), set in on_start
+    tree = None
+    # Name search for the browser's filter field (store.titles)
+    titles = None
+
+    # Startup pipeline (asynckivy task) and, while notes load, its ArchiveLoader
+    _startup_task = None
+    loader = None
+
+    # Per-note undo/redo (store.undo); kept across note switches
+    undo = None
+    _applying_history = False
+
+    # Markdown highlighting (editor.highlight): lexed off the UI thread,
+    # results drained in order into _hl_rows (one token tuple per line)
+    highlighter = None
+    _hl_results = None
+    _hl_rows = None
+
+    # Group timers/stopwatches (timing.group); rows refresh in one pass per frame
+    group = None
+    _group_dirty = None
+    _group_order = None     # item ids in row order
+    _group_index = None     # item id -> row
+
+    # Image attachments + thumbnail cache (store.attachments), under user_data_dir
+    attachments = None
+    _file_manager = None
+
+    # Note view overflow menu (history, workouts, attach, preview)
+    _note_menu = None
+
+    # Workout programs parsed from notes (timing.programs)
+    programs = None
+    program_runner = None
+    _program_menu = None
+
+    # Revision history (store.revisions)
+    revisions = None
+    _history_menu = None
 
-    # Metronome internals
-    _met_event = None
+    # Delta sync (store.sync); None unless RC_SYNC_URL is set
+    sync_client = None
+    _sync_busy = False
+
+    # Time source + scheduler (timing.clock); set before run() to inject one
+    clock = None
+
+    # Timing engines (timing.engines), created in build()
+    countdown = None
+    stopwatch = None
+    metronome = None
+
+    # Sounds
+    _timer_beep = None
     _tick_hi = None
     _tick_lo = None
-    _beat_index = 0
-    _last_tick_ts = None
 
-    # Stopwatch internals
-    _sw_event = None
-    _sw_start_perf = 0.0
-    _sw_accum = 0.0
+    # Startup
+    startup_ms = 0.0
 
     # ======================================================
     # =====================  LIFECYCLE  ====================
@@ -359,58 +466,166 @@ class RCApp(MDApp):
 
     def build(self):
         self.title = "RealCalisthenics (Prototype)"
+        if profiler.requested():
+            self._start_profiler()
         self.theme_cls.theme_style = "Dark"
+        if self.clock is None:
+            self.clock = KivyClock()
+        self.undo = UndoManager(budget_bytes=UNDO_BUDGET_BYTES)
+        self.revisions = RevisionStore()
+        self._revision_trigger = Clock.create_trigger(
+            lambda dt: self.commit_revision(), REVISION_IDLE_S)
+        self._hl_results, self._hl_rows = deque(), []
+        self._hl_trigger = Clock.create_trigger(self._drain_highlight)
+        self.highlighter = HighlightWorker(self._post_highlight)
+        self.programs = ProgramCache()
+        self._program_trigger = Clock.create_trigger(
+            lambda dt: self._refresh_programs(), PROGRAM_REPARSE_S)
+        self.attachments = AttachmentStore(
+            os.path.join(self.user_data_dir, "attachments"),
+            post=lambda fn: Clock.schedule_once(lambda dt: fn(), 0))
+        self._attachments_trigger = Clock.create_trigger(
+            lambda dt: self._refresh_attachments(), ATTACH_RESCAN_S)
+        self.countdown = Countdown(self.clock, on_update=self._on_timer_tick,
+                                   on_finish=self._on_countdown_finish)
+        self.program_runner = ProgramRunner(self.countdown)
+        self.stopwatch = Stopwatch(self.clock, on_update=self._on_sw_tick)
+        self.metronome = Metronome(self.clock, on_beat=self._metronome_tick,
+                                   bpm=self.bpm)
+        self.group = TimerGroup(self.clock, on_change=self._on_group_change,
+                                on_finish=lambda item: self._play_timer_beep())
+        self._group_dirty, self._group_order, self._group_index = set(), [], {}
+        self._group_trigger = Clock.create_trigger(self._refresh_group)
         root = Builder.load_file("kv/base.kv")
         self.notes = NotesController(self)
         return root
 
     def on_start(self):
-        now = datetime.now().isoformat()
-        self.fs = {
-            "root": {
-                "id": "root",
-                "name": "",
-                "type": "folder",
-                "created": now,
-                "children": [
-                    {
-                        "id": "f1",
-                        "name": "Calisthenics",
-                        "type": "folder",
-                        "created": now,
-                        "children": [
-                            {"id": "n1", "name": "Planche ideas",
-                                "type": "note", "created": now, "content": ""},
-                            {"id": "n2", "name": "Front lever drills",
-                                "type": "note", "created": now, "content": ""},
-                        ],
-                    },
-                    {"id": "f2", "name": "Work", "type": "folder",
-                        "created": now, "children": []},
-                    {"id": "n3", "name": "Shopping list",
-                        "type": "note", "created": now, "content": ""},
-                ],
-            }
-        }
+        # skeleton first: an empty root the browser can draw right away;
+        # the notes, sounds and sync arrive from _startup after the first frame
+        self.tree = NoteTree(Node("root", "", FOLDER, datetime.now().timestamp()))
+        self.previews = PreviewCache(self.tree)  # attach first: later listeners read its fields
+        self.aggregates = FolderAggregates(self.tree)
+        self.titles = TitleIndex(self.tree)
+        self.tree.listeners.append(self.notes.on_tree_changed)
+        self.tree.listeners.append(self._forget_deleted_history)
         self._set_active_icon("notes")
         self.notes.render_browser()
 
-        # Initialize timer sub-mode after widgets are built
-        Clock.schedule_once(lambda dt: self.switch_timer_mode("metronome"), 0)
-        Clock.schedule_once(self._sync_dial_angle, 0)
-        Clock.schedule_once(self._render_sw_laps, 0)
-
-        # Preload sounds
-        Clock.schedule_once(lambda dt: (
-            self._ensure_click_sounds(), self._ensure_timer_beep()), 0)
-
         # Keep timer UI consistent on boot
         self._update_progress()
+
+        # Timer screens are built on first visit; only the browser is needed now
+        Window.bind(on_flip=self._on_first_frame)
+        self._startup_task = ak.start(self._startup())
+
+    def on_stop(self):
+        self.attachments.close()
+        if self._startup_task is not None:
+            self._startup_task.cancel()
+        self.highlighter.stop()
+        prof = profiler.active()
+        if prof is not None:
+            Logger.info("RCApp: profile trace written to %s",
+                        prof.export_chrome_trace())
+
+    def _start_profiler(self):
+        """Opt-in (RC_PROFILE=1 or `-- --profile`): time callbacks per frame."""
+        from widgets.profiler_overlay import ProfilerOverlay
+
+        prof = profiler.start(lambda: Clock.frames)
+        Clock.schedule_interval(prof.mark_frame, 0)
+        profiler.instrument_clock(Clock)
+        Clock.schedule_once(
+            lambda dt: Window.add_widget(ProfilerOverlay(prof)), 0)
+
+    def _on_first_frame(self, *_):
+        Window.unbind(on_flip=self._on_first_frame)
+        self.startup_ms = (perf_counter() - _BOOT_TS) * 1000.0
+        if self.startup_ms > STARTUP_BUDGET_MS:
+            Logger.warning("RCApp: first frame after %.0f ms (budget %d ms)",
+                           self.startup_ms, STARTUP_BUDGET_MS)
+        else:
+            Logger.info("RCApp: first frame after %.0f ms (budget %d ms)",
+                        self.startup_ms, STARTUP_BUDGET_MS)
+
+    # -------- Startup pipeline --------
+    async def _startup(self):
+        """Everything on_start leaves out, most visible first: the notes (the
+        open folder ahead of the rest), then the sounds, then sync, which
+        must not see the loaded notes as local changes. Cancelled on stop."""
+        path = os.environ.get(ARCHIVE_ENV)
         try:
-            self.root.ids.sm.get_screen(
-                "timer").ids.timer_view_sm.current = "setup"
-        except Exception:
-            pass
+            data = (await ak.run_in_thread(lambda: read_archive(path), daemon=True)
+                    if path else self._seed_archive())
+        except (OSError, ValueError) as exc:
+            Logger.warning("RCApp: cannot read archive %s: %s", path, exc)
+            data = None
+        if data:
+            await self._load_notes(ArchiveLoader(data, self.tree.root.id))
+
+        # synthesising the cues is pure Python; only SoundLoader needs this thread
+        await ak.run_in_thread(self._write_sound_files, daemon=True)
+        self._ensure_click_sounds()
+        await ak.sleep(0)
+        self._ensure_timer_beep()
+
+        if os.environ.get(SYNC_URL_ENV):
+            self._start_sync_service(os.environ[SYNC_URL_ENV])
+
+    async def _load_notes(self, loader):
+        """Insert the archive a slice per frame, one tree transaction each."""
+        tree = self.tree
+        self.loader, self.notes_loading = loader, True
+        t0 = perf_counter()
+        size = LOAD_BATCH
+        try:
+            while not loader.done:
+                start = perf_counter()
+                with tree.transaction():
+                    for parent_id, node in loader.next_batch(size):
+                        # the parent may have been deleted meanwhile
+                        if parent_id in tree and node.id not in tree:
+                            tree.insert(node, parent_id)
+                # listeners (previews, aggregates, titles) ran on exit: size the
+                # next slice from what this one cost with them
+                spent = max(perf_counter() - start, 1e-4)
+                size = max(16, min(8 * LOAD_BATCH, int(size * LOAD_FRAME_BUDGET_S / spent)))
+                await ak.sleep(0)
+        finally:
+            self.loader, self.notes_loading = None, False
+        Logger.info("RCApp: %d notes and folders loaded in %.0f ms",
+                    loader.loaded, (perf_counter() - t0) * 1000.0)
+        self.notes.render_browser()
+
+    @staticmethod
+    def _seed_archive() -> dict:
+        """Sample notes, used when no archive is configured."""
+        now = datetime.now().isoformat()
+        return {
+            "id": "root",
+            "name": "",
+            "type": "folder",
+            "created": now,
+            "children": [
+                {
+                    "id": "f1",
+                    "name": "Calisthenics",
+                    "type": "folder",
+                    "created": now,
+                    "children": [
+                        {"id": "n1", "name": "Planche ideas",
+                            "type": "note", "created": now, "content": ""},
+                        {"id": "n2", "name": "Front lever drills",
+                            "type": "note", "created": now, "content": ""},
+                    ],
+                },
+                {"id": "f2", "name": "Work", "type": "folder",
+                    "created": now, "children": []},
+                {"id": "n3", "name": "Shopping list",
+                    "type": "note", "created": now, "content": ""},
+            ],
+        }
 
     # ======================================================
     # ==================  NAV / TABS  ======================
@@ -418,6 +633,13 @@ class RCApp(MDApp):
 
     def switch_tab(self, name: str):
         sm = self.root.ids.sm
+        if sm.current == "note_view" and name != "note_view":
+            self._revision_trigger.cancel()
+            self.commit_revision()
+        if name in APP_SCREENS:
+            _, created = ensure_screen(sm, name, APP_SCREENS)
+            if created and name == "timer":
+                self.switch_timer_mode(self.timer_mode)
         order = ["notes", "note_view", "timer"]
         current = sm.current
         if name not in order or current not in order:
@@ -434,9 +656,23 @@ class RCApp(MDApp):
 
         if name == "timer":
             Clock.schedule_once(lambda dt: self._highlight_timer_icons(), 0)
+        elif name == "notes":
+            self.notes.show()
+
+    def _screen(self, name: str):
+        """Top-level screen ``name``, or None if it has not been built yet."""
+        sm = self.root.ids.sm
+        return sm.get_screen(name) if sm.has_screen(name) else None
+
+    def _timer_mode_screen(self, mode: str):
+        timer = self._screen("timer")
+        if timer is None or not timer.ids.timer_modes.has_screen(mode):
+            return None
+        return timer.ids.timer_modes.get_screen(mode)
 
     def _timer_view_sm(self):
-        return self.root.ids.get("timer_view_sm")
+        screen = self._timer_mode_screen("timer")
+        return screen.ids.timer_view_sm if screen else None
 
     # ======================================================
     # ==================  METRONOME  =======================
@@ -451,14 +687,11 @@ class RCApp(MDApp):
     def start_metronome(self):
         self._ensure_click_sounds()
         self.is_metronome_running = True
-        self._beat_index = 0
-        self._metronome_tick(0)
+        self.metronome.start()
 
     def stop_metronome(self):
         self.is_metronome_running = False
-        if self._met_event is not None:
-            self._met_event.cancel()
-            self._met_event = None
+        self.metronome.stop()
 
     def _set_active_icon(self, name: str):
         notes_icon = self.root.ids.tab_notes
@@ -470,19 +703,22 @@ class RCApp(MDApp):
             timer_icon.text_color = self.theme_cls.primary_color
             notes_icon.text_color = self.theme_cls.text_color
 
+    @profiled()
     def on_bpm(self, *_):
         self._sync_dial_angle()
-        if not self.is_metronome_running:
-            return
-        if self._last_tick_ts is None:
-            self._schedule_next_tick()
-            return
-        elapsed = perf_counter() - self._last_tick_ts
-        new_interval = max(60.0 / float(max(1, self.bpm)), 0.001)
-        remaining = max(0.001, new_interval - elapsed)
-        self._schedule_next_tick(delay=remaining)
+        if self.metronome is not None:
+            self.metronome.set_bpm(self.bpm)
 
     # -------- Metronome audio --------
+    @staticmethod
+    def _write_sound_files():
+        """Create any missing cue WAVs; touches no Kivy state (worker thread)."""
+        for name, cue in (("rc_tick_hi.wav", "hi"), ("rc_tick_lo.wav", "lo"),
+                          ("rc_timer_beep.wav", "beep")):
+            path = os.path.join(os.getcwd(), name)
+            if not os.path.exists(path):
+                write_tone(path, *CUES[cue])
+
     def _ensure_click_sounds(self):
         if self._tick_hi and self._tick_lo:
             return
@@ -496,68 +732,51 @@ class RCApp(MDApp):
         self._tick_lo = SoundLoader.load(lo_path)
 
     def _sine_click(self, path, freq=1000, ms=40, vol=0.3, sr=44100):
-        frames = int(sr * ms / 1000.0)
-        with wave.open(path, "wb") as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)
-            wf.setframerate(sr)
-            for n in range(frames):
-                t = n / sr
-                env = 0.5 * (1 - math.cos(2 * math.pi *
-                             (n / (frames - 1)))) if frames > 1 else 1.0
-                val = vol * env * math.sin(2 * math.pi * freq * t)
-                wf.writeframesraw(struct.pack(
-                    "<h", int(max(-1, min(1, val)) * 32767)))
-            wf.writeframes(b"")
-
-    def _schedule_next_tick(self, delay=None):
-        if self._met_event is not None:
-            self._met_event.cancel()
-            self._met_event = None
-        if delay is None:
-            delay = max(60.0 / float(max(1, self.bpm)), 0.001)
-        self._met_event = Clock.schedule_once(self._metronome_tick, delay)
-
-    def _metronome_tick(self, dt):
-        if not self.is_metronome_running or not (self._tick_hi and self._tick_lo):
+        write_tone(path, freq, ms, vol, sr)
+
+    @profiled()
+    def _metronome_tick(self, beat_index):
+        if not (self._tick_hi and self._tick_lo):
             return
-        if self._beat_index % 2 == 0:
+        if beat_index % 2 == 0:
             self._tick_hi.stop()
             self._tick_hi.play()
         else:
             self._tick_lo.stop()
             self._tick_lo.play()
-        self._beat_index += 1
-        self._last_tick_ts = perf_counter()
-        self._schedule_next_tick()
 
     # -------- Metronome dial Helper --------
+    @profiled()
     def _sync_dial_angle(self, *args):
-        try:
-            dial = (
-                self.root.ids.sm.get_screen("timer")
-                .ids.timer_modes.get_screen("metronome")
-                .ids.met_dial
-            )
-            dial.angle = self.bpm * 22.5
-        except Exception:
-            pass
+        screen = self._timer_mode_screen("metronome")
+        if screen:
+            screen.ids.met_dial.angle = self.bpm * 22.5
 
     # ======================================================
     # ==================  TIMER (TAB)  =====================
     # ======================================================
 
     def switch_timer_mode(self, mode: str):
-        order = ["metronome", "timer", "stopwatch"]
+        order = ["metronome", "timer", "stopwatch", "group"]
         if mode not in order:
             raise ValueError(f"Unknown timer mode: {mode}")
 
-        modes = self.root.ids.get("timer_modes")
-        if modes is None:
-            Clock.schedule_once(lambda dt: self.switch_timer_mode(mode), 0)
+        timer = self._screen("timer")
+        if timer is None:
+            # applied when the timer tab is first opened
+            self.timer_mode = mode
             return
+        modes = timer.ids.timer_modes
 
         current = self.timer_mode if self.timer_mode in order else "metronome"
+        _, created = ensure_screen(modes, mode, TIMER_MODES)
+        if created:
+            if mode == "metronome":
+                self._sync_dial_angle()
+            elif mode == "stopwatch":
+                self._render_sw_laps()
+            elif mode == "group":
+                self._refresh_group()
 
         if order.index(mode) > order.index(current):
             modes.transition.direction = "left"
@@ -569,13 +788,15 @@ class RCApp(MDApp):
         self.timer_mode = mode
         self._highlight_timer_icons()
 
+    @profiled()
     def _highlight_timer_icons(self):
-        icon_met = self.root.ids.get("icon_metronome")
-        icon_tim = self.root.ids.get("icon_timer")
-        icon_swp = self.root.ids.get("icon_stopwatch")
-        if not all([icon_met, icon_tim, icon_swp]):
-            Clock.schedule_once(lambda dt: self._highlight_timer_icons(), 0)
+        timer = self._screen("timer")
+        if timer is None:
             return
+        icon_met = timer.ids.icon_metronome
+        icon_tim = timer.ids.icon_timer
+        icon_swp = timer.ids.icon_stopwatch
+        icon_grp = timer.ids.icon_group
 
         default_col = self.theme_cls.text_color
         active_col = self.theme_cls.primary_color
@@ -583,6 +804,7 @@ class RCApp(MDApp):
         icon_met.text_color = active_col if self.timer_mode == "metronome" else default_col
         icon_tim.text_color = active_col if self.timer_mode == "timer" else default_col
         icon_swp.text_color = active_col if self.timer_mode == "stopwatch" else default_col
+        icon_grp.text_color = active_col if self.timer_mode == "group" else default_col
 
     # --------- TIMER helpers ---------
     def _seconds_from_wheels(self):
@@ -607,13 +829,11 @@ class RCApp(MDApp):
             return f"{h:02d}:{m:02d}:{s:02d}"
         return f"{m:02d}:{s:02d}"
 
+    @profiled()
     def _update_progress(self):
-        if self._timer_set_seconds > 0:
-            self.timer_progress = float(
-                self._timer_remaining) / float(self._timer_set_seconds)
-        else:
-            self.timer_progress = 0.0
-        self.timer_display = self._format_time(self._timer_remaining)
+        cd = self.countdown
+        self.timer_progress = cd.progress
+        self.timer_display = self._format_time(cd.remaining)
 
     def _ensure_timer_beep(self):
         """Dedicated short beep for when the countdown ends."""
@@ -621,20 +841,7 @@ class RCApp(MDApp):
             return
         path = os.path.join(os.getcwd(), "rc_timer_beep.wav")
         if not os.path.exists(path):
-            sr, freq, ms, vol = 44100, 900, 220, 0.45
-            frames = int(sr * ms / 1000.0)
-            with wave.open(path, "wb") as wf:
-                wf.setnchannels(1)
-                wf.setsampwidth(2)
-                wf.setframerate(sr)
-                for n in range(frames):
-                    t = n / sr
-                    env = 0.5 * (1 - math.cos(2 * math.pi *
-                                 (n / max(1, frames - 1))))
-                    val = vol * env * math.sin(2 * math.pi * freq * t)
-                    wf.writeframesraw(struct.pack(
-                        "<h", int(max(-1, min(1, val)) * 32767)))
-                wf.writeframes(b"")
+            write_tone(path, *CUES["beep"])
         self._timer_beep = SoundLoader.load(path)
 
     def _play_timer_beep(self):
@@ -660,97 +867,39 @@ class RCApp(MDApp):
 
     # --------- TIMER controls ---------
     def start_timer(self):
-        total = self._seconds_from_wheels()
-        if total <= 0:
+        self._end_program()
+        if not self.countdown.start(self._seconds_from_wheels()):
             return
-
-        # initialize timer values
-        self._timer_set_seconds = total
-        self._timer_remaining = float(total)
-        self._update_progress()  # sets timer_progress=1.0 and display
-
-        # set state and schedule
-        self.is_timer_running = True
-        self.timer_state = "running"
-        self._timer_last_ts = perf_counter()
-
         # show countdown ring
         self._switch_to_countdown()
 
-        # schedule ticking
-        if self._timer_event:
-            self._timer_event.cancel()
-        self._timer_event = Clock.schedule_interval(self._on_timer_tick, 0)
-
-    def _on_timer_tick(self, dt):
-        if self.timer_state != "running" or not self.is_timer_running:
-            return
-
-        now = perf_counter()
-        if self._timer_last_ts is None:
-            self._timer_last_ts = now
-        elapsed = now - self._timer_last_ts
-        self._timer_last_ts = now
-
-        self._timer_remaining = max(0.0, self._timer_remaining - elapsed)
+    @profiled()
+    def _on_timer_tick(self, countdown):
+        """Countdown.on_update: mirror engine state into the KV properties."""
+        self.is_timer_running = countdown.running
+        self.timer_state = countdown.state
         self._update_progress()
 
-        if self._timer_remaining <= 0.0:
-            # finished: beep, stay on countdown at 0
-            self.is_timer_running = False
-            self.timer_state = "finished"
-            if self._timer_event:
-                self._timer_event.cancel()
-                self._timer_event = None
-            self._play_timer_beep()
-
     def pause_timer(self):
-        if self.timer_state != "running":
-            return
-        self.is_timer_running = False
-        self.timer_state = "paused"
-        if self._timer_event:
-            self._timer_event.cancel()
-            self._timer_event = None
+        self.countdown.pause()
 
     def resume_timer(self):
-        if self.timer_state != "paused" or self._timer_remaining <= 0:
+        if self.timer_state != "paused" or self.countdown.remaining <= 0:
             return
-        self.is_timer_running = True
-        self.timer_state = "running"
-        self._timer_last_ts = perf_counter()
-        if self._timer_event:
-            self._timer_event.cancel()
-        self._timer_event = Clock.schedule_interval(self._on_timer_tick, 0)
+        self.countdown.resume()
         # ensure we are on countdown UI
         self._switch_to_countdown()
 
     def stop_timer(self):
-        self.is_timer_running = False
-        self.timer_state = "setup"
-        if self._timer_event:
-            self._timer_event.cancel()
-            self._timer_event = None
-        # reset UI values
-        self._timer_set_seconds = 0
-        self._timer_remaining = 0.0
-        self.timer_progress = 0.0
-        self.timer_display = "00:00"
+        self._end_program()
+        self.countdown.stop()
         # back to setup view
         self._switch_to_setup()
 
     def toggle_or_snooze_timer(self):
         # Running -> pause, Paused -> resume, Finished -> +30s and run
         if self.timer_state == "finished":
-            self._timer_set_seconds = 30
-            self._timer_remaining = 30.0
-            self._update_progress()
-            self.is_timer_running = True
-            self.timer_state = "running"
-            self._timer_last_ts = perf_counter()
-            if self._timer_event:
-                self._timer_event.cancel()
-            self._timer_event = Clock.schedule_interval(self._on_timer_tick, 0)
+            self.countdown.snooze(30)
             self._switch_to_countdown()
             return
 
@@ -759,6 +908,91 @@ class RCApp(MDApp):
         elif self.timer_state in ("paused", "running"):
             self.resume_timer()
 
+    def _on_countdown_finish(self, countdown):
+        self._play_timer_beep()
+        if self.program_runner.advance():
+            self._show_program_step()
+        else:
+            self.program_step = ""
+
+    # --------- Workout programs (from note text) ---------
+    def start_program(self, program):
+        if self._program_menu:
+            self._program_menu.dismiss()
+        self.switch_tab("timer")
+        self.switch_timer_mode("timer")
+        if not self.program_runner.start(program):
+            return
+        self._show_program_step()
+        self._switch_to_countdown()
+
+    def _show_program_step(self):
+        runner = self.program_runner
+        total = len(runner.program.steps)
+        self.program_step = f"{runner.index + 1}/{total} · {runner.step.label}"
+
+    def _end_program(self):
+        self.program_runner.stop()
+        self.program_step = ""
+
+    # ======================================================
+    # ===============  GROUP TIMERS / STOPWATCHES  =========
+    # ======================================================
+
+    def group_add(self, kind: str):
+        n = sum(1 for it in self.group.items.values() if it.kind == kind) + 1
+        if kind == "timer":
+            item = self.group.add_timer(f"Timer {n}", self._seconds_from_wheels() or 60)
+        else:
+            item = self.group.add_stopwatch(f"Stopwatch {n}")
+        self._group_index[item.id] = len(self._group_order)
+        self._group_order.append(item.id)
+
+    def group_toggle(self, item_id: int):
+        self.group.toggle(item_id)
+
+    def group_reset(self, item_id: int):
+        self.group.reset(item_id)
+
+    def group_remove(self, item_id: int):
+        self.group.remove(item_id)
+        self._group_order.remove(item_id)
+        self._group_index = {i: n for n, i in enumerate(self._group_order)}
+
+    def group_start_all(self):
+        for item_id in self._group_order:
+            self.group.start(item_id)
+
+    def group_pause_all(self):
+        for item_id in self._group_order:
+            self.group.pause(item_id)
+
+    def _on_group_change(self, ids):
+        # TimerGroup reports due items; the rows are redrawn once per frame
+        self._group_dirty.update(ids)
+        self._group_trigger()
+
+    def _group_row(self, item) -> dict:
+        return {"item_id": item.id, "kind": item.kind, "label": item.label,
+                "running": item.running,
+                "display": self._format_time(self.group.shown_seconds(item))}
+
+    @profiled()
+    def _refresh_group(self, *_):
+        dirty, self._group_dirty = self._group_dirty, set()
+        mode = self._timer_mode_screen("group")
+        if mode is None:
+            return
+        rv = mode.ids.group_rv
+        items = self.group.items
+        if len(rv.data) != len(self._group_order) or any(i not in items for i in dirty):
+            # added or removed rows
+            rv.data = [self._group_row(items[i]) for i in self._group_order]
+            return
+        # only the rows whose shown second changed (or that were controlled)
+        for item_id in dirty:
+            rv.data[self._group_index[item_id]] = self._group_row(items[item_id])
+
     # ======================================================
     # ==================  STOPWATCH  =======================
     # ======================================================
@@ -772,48 +1006,22 @@ class RCApp(MDApp):
         hund = int((secs - int(secs)) * 100)
         return f"{minutes:02d}:{s:02d}.{hund:02d}"
 
-    def _sw_update_display(self, now_perf=None):
-        if self.sw_running:
-            if now_perf is None:
-                from time import perf_counter
-                now_perf = perf_counter()
-            elapsed = self._sw_accum + (now_perf - self._sw_start_perf)
-        else:
-            elapsed = self._sw_accum
-        self.sw_display = self._format_sw(elapsed)
+    def _sw_update_display(self):
+        self.sw_display = self._format_sw(self.stopwatch.elapsed())
 
     # ---------- STOPWATCH controls ----------
     def sw_start_or_pause(self):
-        if not self.sw_running:
-            # start/resume
-            from time import perf_counter
-            self._sw_start_perf = perf_counter()
-            self.sw_running = True
-            if self._sw_event:
-                self._sw_event.cancel()
-            # ~60fps UI update for smooth hundredths
-            self._sw_event = Clock.schedule_interval(self._on_sw_tick, 0)
-        else:
-            # pause
-            from time import perf_counter
-            now = perf_counter()
-            self._sw_accum += (now - self._sw_start_perf)
-            self.sw_running = False
-            if self._sw_event:
-                self._sw_event.cancel()
-                self._sw_event = None
-            self._sw_update_display(now_perf=now)
-
-    def _on_sw_tick(self, dt):
+        # the engine refreshes the display every frame (~60fps hundredths)
+        self.stopwatch.toggle()
+
+    @profiled()
+    def _on_sw_tick(self, stopwatch):
+        """Stopwatch.on_update: runs per frame while running and on every control."""
+        self.sw_running = stopwatch.running
         self._sw_update_display()
 
     def sw_reset(self):
-        self.sw_running = False
-        if self._sw_event:
-            self._sw_event.cancel()
-            self._sw_event = None
-        self._sw_accum = 0.0
-        self._sw_update_display()
+        self.stopwatch.reset()
         self.sw_laps = []  # triggers on_sw_laps -> re-render
 
     def sw_lap(self):
@@ -823,11 +1031,13 @@ class RCApp(MDApp):
         self.sw_laps = [self.sw_display] + self.sw_laps[:49]
 
     # ---------- LAPS RENDER ----------
+    @profiled()
     def _render_sw_laps(self, *_):
         """Rebuild the laps list UI."""
-        box = self.root.ids.get("sw_laps_box")
-        if not box:
+        screen = self._timer_mode_screen("stopwatch")
+        if not screen:
             return
+        box = screen.ids.sw_laps_box
         box.clear_widgets()
 
         total = len(self.sw_laps)
@@ -861,26 +1071,307 @@ class RCApp(MDApp):
         editor = self.root.ids.sm.get_screen("note_view").ids.note_editor
         editor.focus = True
 
+    @profiled()
     def update_open_note_text(self, txt: str):
         self.open_note_body = txt
         note = self._find_note_by_id(self.open_note_id)
-        if note and note.get("type") == "note":
-            note["content"] = txt
+        if note:
+            old = note.content
+            edit = diff(old, txt) if old != txt else None
+            if edit and not self._applying_history:
+                self.undo.record_edit(note.id, *edit, self.clock.now())
+            self.tree.set_content(note.id, txt, edit=edit)
+            if edit:
+                self.highlighter.edit(txt, edit)
+                self._program_trigger()
+                self._attachments_trigger()
+            # debounce: commit once typing pauses
+            self._revision_trigger.cancel()
+            self._revision_trigger()
+        self._refresh_undo_flags()
+
+    # ---------- Markdown highlighting ----------
+    def open_note_menu(self, caller_widget):
+        """The note toolbar's overflow; each entry opens what its button did."""
+        programs = self.note_programs
+        entries = [
+            ("History", lambda: self.open_history_menu(caller_widget), False),
+            (f"Workouts ({programs})" if programs else "Workouts",
+             lambda: self.open_program_menu(caller_widget), not programs),
+            ("Attach image", self.open_attach_picker, False),
+            ("Edit text" if self.note_preview else "Markdown preview",
+             self.toggle_note_preview, False),
+        ]
+        items = [{"text": text, "disabled": disabled,
+                  "on_release": lambda fn=fn: self._note_menu_pick(fn)}
+                 for text, fn, disabled in entries]
+        if self._note_menu is None:
+            self._note_menu = MDDropdownMenu(caller=caller_widget, items=[], width_mult=4)
+        self._note_menu.caller = caller_widget
+        self._note_menu.items = items
+        self._note_menu.open()
+
+    def _note_menu_pick(self, fn):
+        self._note_menu.dismiss()
+        fn()
+
+    def toggle_note_preview(self):
+        self.note_preview = not self.note_preview
+        if self.note_preview:
+            self._screen("note_view").ids.note_preview.show_rows(self._hl_rows)
+
+    def _post_highlight(self, result):
+        # worker thread: queue in order, hand over to the Kivy thread
+        self._hl_results.append(result)
+        self._hl_trigger()
+
+    def _drain_highlight(self, *_):
+        view = self._screen("note_view").ids.note_preview if self.note_preview else None
+        while self._hl_results:
+            first, old_end, rows = self._hl_results.popleft()
+            self._hl_rows[first:old_end] = rows
+            if view is not None:
+                view.splice(first, old_end, rows)
+
+    # ---------- Workout programs ----------
+    def _open_note_programs(self) -> list:
+        note = self._find_note_by_id(self.open_note_id)
+        if not note:
+            return []
+        # cached per paragraph: only edited paragraphs are parsed again
+        return self.programs.programs(note.content)
+
+    def _refresh_programs(self):
+        self.note_programs = len(self._open_note_programs())
+
+    def open_program_menu(self, caller_widget):
+        items = []
+        for program in self._open_note_programs():
+            steps = len(program.steps)
+            items.append({
+                "text": f"{program.title}  {steps} step{'s' if steps != 1 else ''}"
+                        f"  {self._format_time(program.total_seconds)}",
+                "on_release": lambda p=program: self.start_program(p),
+            })
+            items.append({
+                "text": f"    Export {program.title} as WAV",
+                "on_release": lambda p=program: self.export_program_audio(p),
+            })
+        if not items:
+            return
+        if self._program_menu is None:
+            self._program_menu = MDDropdownMenu(caller=caller_widget, items=[], width_mult=5)
+        self._program_menu.caller = caller_widget
+        self._program_menu.items = items
+        self._program_menu.open()
+
+    def export_program_audio(self, program):
+        """Render the program's cues to a WAV file on a worker thread."""
+        if self._program_menu:
+            self._program_menu.dismiss()
+        slug = re.sub(r"[^\w-]+", "_", program.title).strip("_") or "session"
+        path = os.path.join(os.getcwd(), f"rc_session_{slug}.wav")
+
+        def worker():
+            # offline render: never touches SoundLoader or the Kivy audio path
+            stats = SessionRenderer().render(path, program_events(program),
+                                             program.total_seconds + 1.0)
+            Clock.schedule_once(lambda dt: Logger.info(
+                "RCApp: wrote %s (%.1f min in %.2f s)",
+                path, stats["seconds"] / 60, stats["wall"]), 0)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    # ---------- Image attachments ----------
+    def open_attach_picker(self):
+        if self._file_manager is None:
+            # no previews: the picker would decode every image on this thread
+            self._file_manager = MDFileManager(
+                exit_manager=lambda *_: self._file_manager.close(),
+                select_path=self._attach_selected, preview=False)
+        self._file_manager.show(os.path.expanduser("~"))
+
+    def _attach_selected(self, path: str):
+        self._file_manager.close()
+        note_id = self.open_note_id
+        self.attachments.add(
+            path, on_done=lambda key: self._insert_attachment(note_id, key),
+            on_error=lambda exc: Logger.warning("RCApp: cannot attach %s: %s", path, exc))
+
+    def _insert_attachment(self, note_id: str, key: str):
+        ref = markdown_ref(key, "photo")
+        if note_id == self.open_note_id:
+            # through the editor: undo, highlighting and revisions see it as typing
+            self._screen("note_view").ids.note_editor.insert_text(ref)
+            return
+        note = self.tree.note(note_id)
+        if note is not None:
+            added = ("\n" if note.content else "") + ref
+            self.tree.set_content(note_id, note.content + added,
+                                  edit=(len(note.content), "", added))
+
+    def _refresh_attachments(self):
+        note = self._find_note_by_id(self.open_note_id)
+        keys = refs(note.content) if note else []
+        screen = self._screen("note_view")
+        if keys == self.note_images or screen is None:
+            return
+        self.note_images = keys
+        strip = screen.ids.attachment_strip
+        strip.clear_widgets()
+        for key in keys:
+            thumb = Factory.AttachmentThumb(key=key)
+            strip.add_widget(thumb)
+            self.attachments.thumbnail(
+                key, STRIP_THUMB_PX, lambda path, w=thumb: setattr(w, "source", path))
+
+    def open_attachment(self, key: str):
+        """Full-resolution image, loaded on demand by Kivy's threaded loader."""
+        view = ModalView(size_hint=(0.95, 0.8))
+        view.add_widget(AsyncImage(source=self.attachments.path(key), fit_mode="contain"))
+        view.open()
+
+    # ---------- Undo / redo ----------
+    def undo_note(self):
+        self._apply_history(self.undo.undo)
+
+    def redo_note(self):
+        self._apply_history(self.undo.redo)
+
+    def _apply_history(self, step):
+        note = self._find_note_by_id(self.open_note_id)
+        if not note:
+            return
+        result = step(note.id, note.content)
+        if result is None:
+            return
+        text, cursor = result
+        self._applying_history = True
+        try:
+            self.open_note_body = text  # editor on_text -> update_open_note_text
+        finally:
+            self._applying_history = False
+        editor = self._screen("note_view").ids.note_editor
+        editor.cursor = editor.get_cursor_from_index(cursor)
+
+    def _refresh_undo_flags(self):
+        self.can_undo = self.undo.can_undo(self.open_note_id)
+        self.can_redo = self.undo.can_redo(self.open_note_id)
+
+    def on_open_note_id(self, *_):
+        self._refresh_undo_flags()
+        note = self._find_note_by_id(self.open_note_id)
+        self.highlighter.reset(note.content if note else "")
+        self._refresh_programs()
+        # next frame: on first open the note view is built just after this
+        Clock.schedule_once(lambda dt: self._refresh_attachments(), 0)
+        # base revision for the newly opened note (no-op if unchanged)
+        self.commit_revision()
+
+    # ---------- Revisions ----------
+    def commit_revision(self, note_id=None):
+        note = self._find_note_by_id(note_id or self.open_note_id)
+        if note:
+            self.revisions.commit(note.id, note.content,
+                                  datetime.now().timestamp())
+
+    def open_history_menu(self, caller_widget):
+        self._revision_trigger.cancel()
+        self.commit_revision()
+        items = []
+        for rev in reversed(self.revisions.list(self.open_note_id)):
+            when = datetime.fromtimestamp(rev.ts).strftime("%d %b %H:%M")
+            items.append({
+                "text": f"r{rev.number}  {when}  +{rev.added}/-{rev.removed}",
+                "on_release": lambda n=rev.number: self.restore_revision(n),
+            })
+        if not items:
+            return
+        if self._history_menu is None:
+            self._history_menu = MDDropdownMenu(caller=caller_widget, items=[], width_mult=4)
+        self._history_menu.caller = caller_widget
+        self._history_menu.items = items
+        self._history_menu.open()
+
+    def restore_revision(self, number: int):
+        if self._history_menu:
+            self._history_menu.dismiss()
+        text, _ = self.revisions.restore(self.open_note_id, number,
+                                         datetime.now().timestamp())
+        # goes through update_open_note_text, so the restore itself is undoable
+        self.open_note_body = text
+
+    def _forget_deleted_history(self, changes):
+        for ch in changes:
+            if ch["op"] == "delete":
+                for item_id in ch["removed"]:
+                    self.undo.forget(item_id)
+                    self.revisions.forget(item_id)
 
     def _find_note_by_id(self, note_id: str):
-        if not note_id:
+        if not note_id or self.tree is None:
             return None
+        return self.tree.note(note_id)
 
-        def dfs(node):
-            if node.get("id") == note_id:
-                return node
-            for ch in node.get("children", []):
-                found = dfs(ch)
-                if found:
-                    return found
-            return None
+    # ======================================================
+    # =====================  SYNC  =========================
+    # ======================================================
 
-        return dfs(self.fs.get("root", {}))
+    def _device_id(self) -> str:
+        path = os.path.join(self.user_data_dir, "device_id")
+        try:
+            with open(path, encoding="utf-8") as f:
+                return f.read().strip()
+        except OSError:
+            device_id = uuid4().hex
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(device_id)
+            return device_id
+
+    def _start_sync_service(self, url: str):
+        tracker = SyncTracker(self.tree, self._device_id())
+        self.sync_client = SyncClient(tracker, url)
+        Clock.schedule_interval(self.sync_now, SYNC_INTERVAL_S)
+        Clock.schedule_once(self.sync_now, 1.0)
+
+    def sync_now(self, *_):
+        """Collect deltas here; encode, round trip and decode on a worker thread."""
+        if self.sync_client is None or self._sync_busy:
+            return
+        self._sync_busy = True
+        request = self.sync_client.prepare()
+
+        def worker():
+            try:
+                reply = self.sync_client.exchange(request)
+            except Exception as exc:    # network, HTTP status or a bad reply
+                Clock.schedule_once(lambda dt, exc=exc: self._sync_failed(exc), 0)
+                return
+            Clock.schedule_once(lambda dt: self._sync_done(reply), 0)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _sync_done(self, reply):
+        self._sync_busy = False
+        result = self.sync_client.finish(*reply)
+        if result.applied:
+            Logger.info("RCApp: sync sent %d, applied %d (%d/%d bytes)",
+                        result.sent, result.applied, result.bytes_out, result.bytes_in)
+        note = self._find_note_by_id(self.open_note_id)
+        if note and note.content != self.open_note_body:
+            # edited on another device: positions in the local history are stale
+            self.undo.forget(note.id)
+            self.highlighter.reset(note.content)
+            self._applying_history = True
+            try:
+                self.open_note_body = note.content
+            finally:
+                self._applying_history = False
+
+    def _sync_failed(self, exc):
+        self._sync_busy = False
+        self.sync_client.fail()
+        Logger.warning("RCApp: sync failed: %s", exc)
 
 
 if __name__ == "__main__":
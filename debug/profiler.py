@@ -0,0 +1,193 @@
+# =============================
+# debug/profiler.py
+# =============================
+import json
+import os
+import sys
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+
+ENV_VAR = "RC_PROFILE"            # RC_PROFILE=1 python app.py
+CLI_FLAG = "--profile"            # python app.py -- --profile
+TRACE_ENV_VAR = "RC_PROFILE_TRACE"
+DEFAULT_TRACE_PATH = "rc_profile_trace.json"
+
+
+def requested(argv=None, environ=None) -> bool:
+    """True if profiling was asked for on the command line or environment."""
+    argv = sys.argv if argv is None else argv
+    environ = os.environ if environ is None else environ
+    return CLI_FLAG in argv or environ.get(ENV_VAR, "") not in ("", "0")
+
+
+class FrameProfiler:
+    """Records timed spans of app callbacks and attributes them to frames.
+
+    ``frame_source`` returns the current frame number (``Clock.frames`` in
+    the app). Nested spans are kept, and each span also stores its self time
+    so a render triggered from a tick is not counted twice.
+    """
+
+    def __init__(self, frame_source, max_spans=200_000):
+        self.frame_source = frame_source
+        self.t0 = perf_counter()
+        # (frame, label, start, duration, self_duration)
+        self.spans = deque(maxlen=max_spans)
+        # (frame, timestamp) recorded once per frame
+        self.frames = deque(maxlen=max_spans // 10)
+        self._stack = []  # child-time accumulators of open spans
+
+    @contextmanager
+    def span(self, label: str):
+        frame = self.frame_source()
+        self._stack.append(0.0)
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            dur = perf_counter() - start
+            child = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += dur
+            self.spans.append((frame, label, start, dur, dur - child))
+
+    def mark_frame(self, *_):
+        self.frames.append((self.frame_source(), perf_counter()))
+
+    # ---------- Reports ----------
+    def frame_totals(self, last_frames=120, limit=8):
+        """[(label, self ms/frame, worst frame ms, calls)] for recent frames."""
+        if not self.spans:
+            return []
+        newest = self.spans[-1][0]
+        last_frames = max(1, min(last_frames, newest - self.spans[0][0] + 1))
+        first = newest - last_frames + 1
+        per_label = {}
+        per_frame = {}
+        calls = {}
+        for frame, label, _, _, self_dur in reversed(self.spans):
+            if frame < first:
+                break
+            per_label[label] = per_label.get(label, 0.0) + self_dur
+            calls[label] = calls.get(label, 0) + 1
+            key = (label, frame)
+            per_frame[key] = per_frame.get(key, 0.0) + self_dur
+        worst = {}
+        for (label, _), total in per_frame.items():
+            worst[label] = max(worst.get(label, 0.0), total)
+        rows = [
+            (label, total * 1000.0 / last_frames, worst[label] * 1000.0, calls[label])
+            for label, total in per_label.items()
+        ]
+        rows.sort(key=lambda r: r[1], reverse=True)
+        return rows[:limit]
+
+    def last_frame_ms(self):
+        if len(self.frames) < 2:
+            return 0.0
+        return (self.frames[-1][1] - self.frames[-2][1]) * 1000.0
+
+    # ---------- Chrome trace export ----------
+    def chrome_trace(self) -> dict:
+        """Trace Event Format dict (chrome://tracing, Perfetto)."""
+        us = lambda t: round((t - self.t0) * 1e6, 3)
+        events = [
+            {"name": label, "cat": "callback", "ph": "X", "pid": 1, "tid": 1,
+             "ts": us(start), "dur": round(dur * 1e6, 3),
+             "args": {"frame": frame, "self_ms": round(self_dur * 1000.0, 3)}}
+            for frame, label, start, dur, self_dur in self.spans
+        ]
+        events.extend(
+            {"name": f"frame {frame}", "cat": "frame", "ph": "i", "s": "g",
+             "pid": 1, "tid": 1, "ts": us(ts)}
+            for frame, ts in self.frames
+        )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path=None) -> str:
+        path = path or os.environ.get(TRACE_ENV_VAR) or DEFAULT_TRACE_PATH
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+        return path
+
+
+_active = None
+
+
+def start(frame_source) -> FrameProfiler:
+    global _active
+    _active = FrameProfiler(frame_source)
+    return _active
+
+
+def active():
+    return _active
+
+
+def profiled(label=None):
+    """Decorator: time the wrapped callback while a profiler is running.
+
+    With profiling off the cost is one global lookup per call.
+    """
+    def deco(fn):
+        name = label or fn.__qualname__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            prof = _active
+            if prof is None:
+                return fn(*args, **kwargs)
+            with prof.span(name):
+                return fn(*args, **kwargs)
+        wrapper._profiled = True
+        return wrapper
+    return deco
+
+
+class _Timed:
+    """A scheduled callback under a span. Compares equal to the callback,
+    so ``Clock.unschedule(callback)`` still finds it."""
+
+    __slots__ = ("fn", "label")
+
+    def __init__(self, fn, label):
+        self.fn = fn
+        self.label = label
+
+    def __call__(self, *args):
+        prof = _active
+        if prof is None:
+            return self.fn(*args)
+        with prof.span(self.label):
+            return self.fn(*args)
+
+    def __eq__(self, other):
+        return self.fn == (other.fn if isinstance(other, _Timed) else other)
+
+    def __hash__(self):
+        return hash(self.fn)
+
+
+def _timed(fn):
+    if isinstance(fn, _Timed) or getattr(fn, "_profiled", False):
+        return fn   # already has a span
+    label = getattr(fn, "__qualname__", None) or type(fn).__qualname__
+    return _Timed(fn, label)
+
+
+def instrument_clock(clock):
+    """Give every callback scheduled on ``clock`` from now on its own span.
+
+    Wraps ``schedule_once``, ``schedule_interval`` and ``create_trigger``
+    on the instance, so Kivy's own callbacks show up next to the
+    ``@profiled`` ones. Only for profiling runs: callbacks are then held
+    strongly instead of through Kivy's weak method references.
+    """
+    for name in ("schedule_once", "schedule_interval", "create_trigger"):
+        original = getattr(clock, name)
+
+        def scheduler(callback, *args, _original=original, **kwargs):
+            return _original(_timed(callback), *args, **kwargs)
+        setattr(clock, name, wraps(original)(scheduler))
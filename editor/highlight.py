@@ -0,0 +1,144 @@
+# =============================
+# editor/highlight.py
+# =============================
+import queue
+import threading
+
+from pygments.lexers import MarkdownLexer, TextLexer, get_lexer_by_name
+from pygments.token import String
+from pygments.util import ClassNotFound
+
+FENCE = "```"
+
+
+def _merge(tokens) -> tuple:
+    """Drop the newline Pygments appends and join runs of one token type."""
+    out = []
+    for ttype, value in tokens:
+        value = value.replace("\n", "")
+        if not value:
+            continue
+        if out and out[-1][0] is ttype:
+            out[-1] = (ttype, out[-1][1] + value)
+        else:
+            out.append((ttype, value))
+    return tuple(out)
+
+
+class LineHighlighter:
+    """Markdown tokens per line, re-lexed only around each edit.
+
+    ``states[i]`` is the lexer state at the start of line ``i``: ``None`` in
+    prose, or the language of the fenced code block the line sits in ("" for
+    a bare fence). An edit re-lexes its own lines and keeps going only while
+    the state at the next line start differs from the cached one, so typing
+    costs the changed lines unless it opens or closes a fence.
+    """
+
+    def __init__(self):
+        self._markdown = MarkdownLexer()
+        self._code = {}         # fence language -> lexer
+        self.lines = [""]
+        self.states = [None]
+        self.tokens = [()]
+
+    def _lexer(self, lang: str):
+        lexer = self._code.get(lang)
+        if lexer is None:
+            try:
+                lexer = get_lexer_by_name(lang) if lang else TextLexer()
+            except ClassNotFound:
+                lexer = TextLexer()
+            self._code[lang] = lexer
+        return lexer
+
+    def lex_line(self, line: str, state):
+        """(tokens, state after the line) for one line without its newline."""
+        stripped = line.strip()
+        if state is None:
+            if stripped.startswith(FENCE):
+                return ((String.Backtick, line),), stripped[len(FENCE):].strip()
+            return _merge(self._markdown.get_tokens(line)), None
+        if stripped == FENCE:
+            return ((String.Backtick, line),), None
+        return _merge(self._lexer(state).get_tokens(line)), state
+
+    def reset(self, text: str):
+        """Lex ``text`` from scratch; returns ``(0, old line count, tokens)``."""
+        old = len(self.lines)
+        self.lines = text.split("\n")
+        self.states = [None] * len(self.lines)
+        self.tokens = [()] * len(self.lines)
+        self._relex(0, len(self.lines))
+        return 0, old, list(self.tokens)
+
+    def apply(self, text: str, edit):
+        """Re-lex after ``edit`` = ``(pos, deleted, inserted)`` turned the old
+        text into ``text``.
+
+        Returns ``(first, old_end, tokens)``: old lines ``first:old_end``
+        are now the ``tokens`` rows.
+        """
+        pos, deleted, inserted = edit
+        first = text.count("\n", 0, pos)
+        old_span = deleted.count("\n") + 1
+        start = text.rfind("\n", 0, pos) + 1
+        stop = text.find("\n", pos + len(inserted))
+        new_lines = text[start:stop if stop >= 0 else len(text)].split("\n")
+        new_span = len(new_lines)
+
+        end = first + old_span
+        self.lines[first:end] = new_lines
+        self.tokens[first:end] = [()] * new_span
+        # the start state of the first line is still valid; the rest are redone
+        self.states[first + 1:end] = [None] * (new_span - 1)
+        done = self._relex(first, first + new_span)
+        return first, done - new_span + old_span, self.tokens[first:done]
+
+    def _relex(self, first: int, must_reach: int) -> int:
+        """Lex from ``first`` until past ``must_reach`` and the state at a
+        line start matches the cache again; returns the first line not lexed."""
+        state = self.states[first]
+        i = first
+        while i < len(self.lines):
+            self.tokens[i], state = self.lex_line(self.lines[i], state)
+            i += 1
+            if i == len(self.lines):
+                break
+            if i >= must_reach and self.states[i] == state:
+                break
+            self.states[i] = state
+        return i
+
+
+class HighlightWorker:
+    """Runs a ``LineHighlighter`` on a daemon thread.
+
+    ``reset``/``edit`` only enqueue, so the caller (the UI thread) pays
+    nothing for lexing. Each result is handed to ``post`` on the worker
+    thread, in submission order; ``post`` must marshal it to the UI.
+    """
+
+    def __init__(self, post):
+        self.post = post
+        self._jobs = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def reset(self, text: str):
+        self._jobs.put((text, None))
+
+    def edit(self, text: str, edit):
+        self._jobs.put((text, edit))
+
+    def stop(self):
+        self._jobs.put(None)
+
+    def _run(self):
+        hl = LineHighlighter()
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            text, edit = job
+            self.post(hl.reset(text) if edit is None else hl.apply(text, edit))
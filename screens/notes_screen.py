@@ -1,22 +1,44 @@
 # =============================
 # screens/notes_screen.py
 # =============================
+from collections import OrderedDict
 from datetime import datetime
-from uuid import uuid4
 
 from kivy.clock import Clock
+from debug.profiler import profiled
 from widgets.file_tile import FileTile
 from kivymd.uix.menu import MDDropdownMenu
 from kivymd.uix.dialog import MDDialog
 from kivymd.uix.button import MDFlatButton, MDRaisedButton
 from kivymd.uix.textfield import MDTextField
 
+SORT_LABELS = {"date": "Date", "name": "Name", "type": "Type",
+               "modified": "Modified", "size": "Size"}
+VIEW_CACHE_SIZE = 8     # folder views kept for instant back/forward navigation
+LOADING_RENDER_S = 0.25  # while startup fills the tree, re-render at most this often
+FILTER_RESULTS = 30     # tiles shown for a title filter (store/titles.py ranks them)
+TILE_THUMB_PX = 192     # thumbnail size for a note's first image on its tile
+
 
 class NotesController:
-    """GoodNotes-style browser: sorting, nav, and create New Note/Folder."""
+    """GoodNotes-style browser: sorting, nav, create, and multi-select
+    rename/move/duplicate/delete on ``app.tree``."""
 
     def __init__(self, app):
         self.app = app
+        self.selected = []      # ids picked in select mode, in tap order
+        self.filter_text = ""   # non-empty: the grid shows title matches, not a folder
+        self._stale = False     # tree changed while the notes screen was hidden
+        self._tiles = {}        # item id -> FileTile currently on screen
+        # folder id -> {item id: FileTile} in display order, most recent last
+        self._views = OrderedDict()
+        # many tree changes in one frame -> one render
+        self._render_trigger = Clock.create_trigger(lambda dt: self.render_browser())
+        # startup inserts a slice every frame; redrawing each would be quadratic
+        self._loading_render_trigger = Clock.create_trigger(
+            lambda dt: self.render_browser(), LOADING_RENDER_S)
+        # keystrokes landing in the same frame -> one search
+        self._filter_trigger = Clock.create_trigger(lambda dt: self.render_browser())
 
         # SORT menu
         self._sort_menu = MDDropdownMenu(
@@ -25,6 +47,8 @@ class NotesController:
                 {"text": "Date", "on_release": lambda: self.set_sort("date")},
                 {"text": "Name", "on_release": lambda: self.set_sort("name")},
                 {"text": "Type", "on_release": lambda: self.set_sort("type")},
+                {"text": "Modified", "on_release": lambda: self.set_sort("modified")},
+                {"text": "Size", "on_release": lambda: self.set_sort("size")},
             ],
             width_mult=2,
         )
@@ -41,8 +65,81 @@ class NotesController:
             width_mult=3,
         )
 
+        # ACTIONS menu (select mode); items depend on the selection
+        self._actions_menu = MDDropdownMenu(caller=None, items=[], width_mult=3)
+        self._move_menu = MDDropdownMenu(caller=None, items=[], width_mult=4)
+
         self._name_dialog = None
         self._name_field = None  # MDTextField while dialog is open
+        self._confirm_dialog = None
+
+    # ---------- Tree events ----------
+    def on_tree_changed(self, changes):
+        """NoteTree listener: one call per transaction, however many nodes."""
+        tree = self.app.tree
+        edits_only = all(ch["op"] == "edit" for ch in changes)
+        if edits_only and self.app.sort_mode not in ("modified", "size"):
+            # bodies aren't drawn, but their cached preview is: patch those tiles
+            # (under the aggregate sorts an edit can reorder, so re-render)
+            for ch in changes:
+                view = self._views.get(tree.parent_id(ch["id"]), {})
+                tile = view.get(ch["id"])
+                node = tree.get(ch["id"])
+                if tile is not None and node is not None:
+                    for key, value in self._tile_preview(node).items():
+                        setattr(tile, key, value)
+                    self._request_thumb(tile, node)
+            return
+        gone = self._invalidate_views(changes)
+        if gone:
+            self.selected = [i for i in self.selected if i not in gone]
+            path = self.app.current_path
+            for k, i in enumerate(path):
+                if i in gone:
+                    self.app.current_path = path[:k]
+                    break
+        if self.app.root.ids.sm.current != "notes":
+            self._stale = True  # nobody sees the grid; redraw once on show()
+        elif self.app.notes_loading:
+            self._loading_render_trigger()
+        else:
+            self._render_trigger()
+
+    def show(self):
+        """The notes screen is (back) on screen: catch up on hidden changes."""
+        if self._stale:
+            self.render_browser()
+
+    def _invalidate_views(self, changes) -> set:
+        """Drop the cached views ``changes`` touched; returns deleted ids.
+
+        A change in folder F invalidates F and F's parent, whose tile for F
+        shows F's item count. Under the aggregate sorts every ancestor's
+        order can move too, so the whole chain goes.
+        """
+        tree = self.app.tree
+        whole_chain = self.app.sort_mode in ("modified", "size")
+        dirty, gone = set(), set()
+        for ch in changes:
+            op = ch["op"]
+            if op == "delete":
+                gone.update(ch["removed"])
+                dirty.add(ch["parent"])
+            elif op == "create":
+                dirty.add(ch["parent"])
+            elif op == "move":
+                dirty.update((ch["old"], ch["new"]))
+            else:  # rename / edit change a tile in the item's own folder
+                dirty.add(tree.parent_id(ch["id"]))
+        for folder_id in dirty:
+            depth = 0
+            while folder_id is not None and (whole_chain or depth < 2):
+                self._views.pop(folder_id, None)
+                folder_id = tree.parent_id(folder_id)
+                depth += 1
+        for item_id in gone:
+            self._views.pop(item_id, None)
+        return gone
 
     # ---------- Menus ----------
     def open_sort_menu(self, caller_widget):
@@ -52,42 +149,154 @@ class NotesController:
     def set_sort(self, mode: str):
         self._sort_menu.dismiss()
         self.app.sort_mode = mode
-        self.app.sort_label = "Date" if mode == "date" else "Name" if mode == "name" else "Type"
+        self.app.sort_label = SORT_LABELS[mode]
+        self._views.clear()
         self.render_browser()
 
+    # ---------- Title filter ----------
+    def set_filter(self, text: str):
+        text = text.strip()
+        if text != self.filter_text:
+            self.filter_text = text
+            self._filter_trigger()
+
+    def _clear_filter(self):
+        self.filter_text = ""
+        self.app.root.ids.sm.get_screen('notes').ids.filter_field.text = ""
+
     def open_add_menu(self, caller_widget):
         self._add_menu.caller = caller_widget
         self._add_menu.open()
 
-    # ---------- Create item dialog ----------
-    def _open_name_dialog(self, kind: str):
-        # close the dropdown first
+    # ---------- Select mode ----------
+    def toggle_select_mode(self):
+        self.app.select_mode = not self.app.select_mode
+        self._set_selection([])
+
+    def _set_selection(self, ids):
+        self.selected = list(ids)
+        self.app.selection_count = len(self.selected)
+        for item_id, tile in self._tiles.items():
+            tile.selected = item_id in self.selected
+
+    def _toggle_selected(self, item_id: str):
+        if item_id in self.selected:
+            self._set_selection([i for i in self.selected if i != item_id])
+        else:
+            self._set_selection(self.selected + [item_id])
+
+    def open_actions_menu(self, caller_widget):
+        if not self.selected:
+            return
+        items = []
+        if len(self.selected) == 1:
+            items.append({"text": "Rename", "on_release": self._open_rename_dialog})
+        items += [
+            {"text": "Move to...", "on_release": lambda: self._open_move_menu(caller_widget)},
+            {"text": "Duplicate", "on_release": self._do_duplicate},
+            {"text": "Delete", "on_release": self._confirm_delete},
+        ]
+        self._actions_menu.items = items
+        self._actions_menu.caller = caller_widget
+        self._actions_menu.open()
+
+    def _open_move_menu(self, caller_widget):
+        self._actions_menu.dismiss()
+        tree = self.app.tree
+        items = []
+        for fid, node in tree.folders():
+            if any(tree.is_within(fid, sel) for sel in self.selected):
+                continue  # can't move a folder into itself
+            items.append((self._folder_label(fid), fid))
+        items.sort(key=lambda x: x[0].lower())
+        self._move_menu.items = [
+            {"text": label, "on_release": lambda _fid=fid: self._do_move(_fid)}
+            for label, fid in items
+        ]
+        self._move_menu.caller = caller_widget
+        self._move_menu.open()
+
+    def _do_move(self, dest_id: str):
+        self._move_menu.dismiss()
+        self.app.tree.move(self.selected, dest_id)
+        self._set_selection([])
+
+    def _do_duplicate(self):
+        self._actions_menu.dismiss()
+        self.app.tree.duplicate(self.selected)
+        self._set_selection([])
+
+    def _confirm_delete(self):
+        self._actions_menu.dismiss()
+        count = len(self.selected)
+
+        def on_cancel(*_): self._dismiss_confirm_dialog()
+
+        def on_delete(*_):
+            self._dismiss_confirm_dialog()
+            self.app.tree.delete(self.selected)
+            self._set_selection([])
+
+        self._confirm_dialog = MDDialog(
+            title=f"Delete {count} item{'s' if count != 1 else ''}?",
+            text="Folders are deleted with everything inside them.",
+            buttons=[
+                MDFlatButton(text="Cancel", on_release=on_cancel),
+                MDRaisedButton(text="Delete", on_release=on_delete),
+            ],
+        )
+        self._confirm_dialog.open()
+
+    def _dismiss_confirm_dialog(self):
+        if self._confirm_dialog:
+            self._confirm_dialog.dismiss()
+            self._confirm_dialog = None
+
+    # ---------- Name dialog (create / rename) ----------
+    def _open_name_dialog(self, kind: str, rename_id=None):
+        # close the dropdowns first
         self._add_menu.dismiss()
+        self._actions_menu.dismiss()
 
         # input field
         self._name_field = MDTextField(
             hint_text="Folder name" if kind == "folder" else "Note title",
-            text="",
+            text=self.app.tree.get(rename_id).name if rename_id else "",
             mode="rectangle",
             size_hint_y=None,
             height="48dp",
         )
 
         def on_cancel(*_): self._dismiss_name_dialog()
-        def on_create(*_): self._do_create(kind)
+
+        def on_create(*_):
+            if rename_id:
+                self._do_rename(rename_id)
+            else:
+                self._do_create(kind)
+
+        if rename_id:
+            title, action = "Rename", "Rename"
+        else:
+            title = "Create Folder" if kind == "folder" else "Create Note"
+            action = "Create"
 
         self._name_dialog = MDDialog(
-            title="Create Folder" if kind == "folder" else "Create Note",
+            title=title,
             type="custom",
             content_cls=self._name_field,
             auto_dismiss=False,
             buttons=[
                 MDFlatButton(text="Cancel", on_release=on_cancel),
-                MDRaisedButton(text="Create", on_release=on_create),
+                MDRaisedButton(text=action, on_release=on_create),
             ],
         )
         self._name_dialog.open()
 
+    def _open_rename_dialog(self):
+        item_id = self.selected[0]
+        self._open_name_dialog(self.app.tree.get(item_id).type, rename_id=item_id)
+
     def _dismiss_name_dialog(self):
         if self._name_dialog:
             self._name_dialog.dismiss()
@@ -101,94 +310,152 @@ class NotesController:
         name = name_text.strip() or ("Untitled Folder" if kind ==
                                      "folder" else "Untitled Note")
 
-        folder = self._get_current_folder()
-        children = folder.setdefault("children", [])
-        now = datetime.now().isoformat()
-
-        if kind == "folder":
-            new_item = {
-                "id": f"f{uuid4().hex[:8]}",
-                "name": name,
-                "type": "folder",
-                "created": now,
-                "children": [],
-            }
-        else:
-            new_item = {
-                "id": f"n{uuid4().hex[:8]}",
-                "name": name,
-                "type": "note",
-                "created": now,
-                "content": "",  # NEW: body storage
-            }
+        # the tree listener schedules the re-render
+        self.app.tree.create(self._get_current_folder().id, kind, name)
 
-        children.append(new_item)
-        Clock.schedule_once(lambda dt: self.render_browser(), 0)
+    def _do_rename(self, item_id: str):
+        name_text = self._name_field.text if self._name_field else ""
+        self._dismiss_name_dialog()
+        name = name_text.strip()
+        if name:
+            self.app.tree.rename(item_id, name)
+            if item_id == self.app.open_note_id:
+                self.app.open_note_title = name
+        self._set_selection([])
 
     # ---------- FS helpers ----------
     def _get_current_folder(self):
-        node = self.app.fs["root"]
-        for fid in self.app.current_path:
-            for ch in node.get("children", []):
-                if ch["id"] == fid and ch["type"] == "folder":
-                    node = ch
-                    break
-        return node
+        tree = self.app.tree
+        if self.app.current_path:
+            node = tree.get(self.app.current_path[-1])
+            if node is not None and node.is_folder:
+                return node
+        return tree.root
 
     # ---------- Rendering ----------
+    @profiled()
     def render_browser(self):
         grid = self.app.root.ids.sm.get_screen('notes').ids.grid
         grid.clear_widgets()
+        self._stale = False
 
         folder = self._get_current_folder()
-        self.app.current_folder_name = folder["name"] if folder["id"] != "root" else ""
-        items = list(folder.get("children", []))
+        self.app.current_folder_name = folder.name if folder is not self.app.tree.root else ""
+
+        if self.filter_text:
+            self._tiles = self._match_view(self.filter_text)
+        else:
+            self._tiles = self._folder_view(folder)
+        for item_id, tile in self._tiles.items():
+            tile.selected = item_id in self.selected
+            grid.add_widget(tile)
 
+    def _folder_view(self, folder) -> dict:
+        """Sorted tiles for ``folder``: from the LRU cache, or built and cached."""
+        view = self._views.get(folder.id)
+        if view is not None:
+            self._views.move_to_end(folder.id)
+            return view
+
+        items = list(folder.children)
         mode = self.app.sort_mode
         if mode == "date":
-            items.sort(key=lambda x: x["created"], reverse=True)
+            items.sort(key=lambda x: x.created, reverse=True)
         elif mode == "name":
-            items.sort(key=lambda x: x["name"].lower())
+            items.sort(key=lambda x: x.name.lower())
+        elif mode == "modified":
+            # folders carry their newest descendant's time (store/aggregates.py)
+            items.sort(key=lambda x: x.modified, reverse=True)
+        elif mode == "size":
+            items.sort(key=lambda x: x.size, reverse=True)
         else:  # type
-            def key_fn(x):
-                t_rank = 0 if x["type"] == "folder" else 1
-                ts = int(datetime.fromisoformat(x["created"]).timestamp())
-                return (t_rank, -ts)
-            items.sort(key=key_fn)
-
-        for it in items:
-            tile = FileTile(
-                item_id=it["id"],
-                icon_name="folder-outline" if it["type"] == "folder" else "file-document-outline",
-                caption=it["name"],
-            )
-            tile.bind(on_release=lambda w, _id=it["id"]: self.open_item(_id))
-            grid.add_widget(tile)
+            items.sort(key=lambda x: (x.kind, -int(x.created)))  # FOLDER < NOTE
+
+        view = {it.id: self._make_tile(it, self._tile_preview(it)) for it in items}
+        self._views[folder.id] = view
+        while len(self._views) > VIEW_CACHE_SIZE:
+            self._views.popitem(last=False)
+        return view
+
+    def _match_view(self, query: str) -> dict:
+        """Tiles for the best title matches in the whole tree, with their folder."""
+        tree = self.app.tree
+        view = {}
+        for item_id in self.app.titles.search(query, FILTER_RESULTS):
+            it = tree.get(item_id)
+            preview = self._tile_preview(it)
+            preview["meta"] = self._folder_label(tree.parent_id(item_id))
+            view[item_id] = self._make_tile(it, preview)
+        return view
+
+    def _make_tile(self, it, preview: dict):
+        tile = FileTile(
+            item_id=it.id,
+            icon_name="folder-outline" if it.is_folder else "file-document-outline",
+            caption=it.name,
+            **preview,
+        )
+        tile.bind(on_release=lambda w, _id=it.id: self.open_item(_id))
+        self._request_thumb(tile, it)
+        return tile
+
+    def _request_thumb(self, tile, it):
+        """Show the note's first image once its thumbnail exists (made off-thread)."""
+        key = "" if it.is_folder else it.image
+        if not key:
+            tile.thumb = ""
+            return
+
+        def done(path, item_id=it.id):
+            node = self.app.tree.get(item_id)
+            if node is not None and node.image == key:  # not replaced meanwhile
+                tile.thumb = path
+
+        self.app.attachments.thumbnail(key, TILE_THUMB_PX, done)
+
+    def _folder_label(self, folder_id: str) -> str:
+        tree = self.app.tree
+        names = [tree.get(i).name for i in tree.path(folder_id)]
+        return "/" + "/".join(names) if names else "All Notes"
+
+    @staticmethod
+    def _tile_preview(it) -> dict:
+        """Tile text from cached metadata only (see store/previews.py)."""
+        if it.is_folder:
+            n = len(it.children)
+            return {"snippet": "", "meta": f"{n} item{'s' if n != 1 else ''}"}
+        when = datetime.fromtimestamp(it.modified)
+        words = it.words
+        return {
+            "snippet": it.snippet,
+            "meta": f"{words} word{'s' if words != 1 else ''} · {when:%d %b %H:%M}",
+        }
 
     # ---------- Navigation ----------
     def open_item(self, item_id: str):
-        folder = self._get_current_folder()
-        target = None
-        for ch in folder.get("children", []):
-            if ch["id"] == item_id:
-                target = ch
-                break
+        if self.app.select_mode:
+            self._toggle_selected(item_id)
+            return
+        target = self.app.tree.get(item_id)
         if not target:
             return
 
-        if target["type"] == "folder":
-            self.app.current_path.append(target["id"])
+        if target.is_folder:
+            if self.app.loader is not None:
+                self.app.loader.prioritize(target.id)  # still loading: fill this one next
+            if self.filter_text:
+                self._clear_filter()    # a matched folder opens as a normal folder view
+            self.app.current_path = self.app.tree.path(target.id)
             self.render_browser()
         else:
             # load selected note into app state
-            self.app.open_note_id = target["id"]
-            self.app.open_note_title = target["name"]
-            self.app.open_note_body = target.get("content", "")
-            sm = self.app.root.ids.sm
-            sm.transition.direction = "left"
-            sm.current = "note_view"
+            self.app.open_note_id = target.id
+            self.app.open_note_title = target.name
+            self.app.open_note_body = target.content
+            self.app.switch_tab("note_view")  # builds the editor on first open
 
     def go_up(self):
         if self.app.current_path:
             self.app.current_path.pop()
+            self._set_selection([])
             self.render_browser()
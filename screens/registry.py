@@ -0,0 +1,45 @@
+# =============================
+# screens/registry.py
+# =============================
+from kivy.factory import Factory
+from kivy.lang import Builder
+
+# screen name -> (kv file with its rule, Factory class name)
+APP_SCREENS = {
+    "note_view": ("kv/note_view.kv", "NoteView"),
+    "timer": ("kv/timer.kv", "TimerScreen"),
+}
+
+# timer sub-mode -> (kv file, Factory class name), inside TimerScreen.ids.timer_modes
+TIMER_MODES = {
+    "metronome": ("kv/metronome.kv", "MetronomeMode"),
+    "timer": ("kv/timer.kv", "TimerMode"),
+    "stopwatch": ("kv/stopwatch.kv", "StopwatchMode"),
+    "group": ("kv/group.kv", "GroupMode"),
+}
+
+_loaded_kv = set()
+
+
+def load_kv_once(path: str):
+    """Parse a rules-only kv file the first time it is needed.
+
+    Builder keeps the parsed rules, so later Factory instances reuse them;
+    loading the same file twice would register every rule a second time.
+    """
+    if path in _loaded_kv:
+        return
+    Builder.load_file(path)
+    _loaded_kv.add(path)
+
+
+def ensure_screen(manager, name: str, specs: dict):
+    """Return (screen, created) for ``name``, building it on first request."""
+    if manager.has_screen(name):
+        return manager.get_screen(name), False
+    kv_path, cls_name = specs[name]
+    load_kv_once(kv_path)
+    screen = getattr(Factory, cls_name)()
+    screen.name = name
+    manager.add_widget(screen)
+    return screen, True
@@ -0,0 +1,165 @@
+# =============================
+# store/aggregates.py
+# =============================
+import time
+
+
+class FolderAggregates:
+    """Keeps ``notes``, ``size`` and ``modified`` totals on every folder.
+
+    ``notes`` counts the notes anywhere below a folder, ``size`` sums their
+    content lengths and ``modified`` is the latest change inside it. Notes
+    carry their own ``size``. The totals are computed in one pass when the
+    listener is attached; after that each change walks only the ancestor
+    chain of the node it touched, O(depth). A batch that mixes moves or
+    deletes with other records (a multi-item move, a sync apply) is
+    recounted instead: the folders on the touched chains, from their
+    children.
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        tree.listeners.append(self._on_changes)
+        self._fill(tree.root)
+
+    # ---------- Initial pass ----------
+    @staticmethod
+    def _fill(top):
+        """Post-order totals for ``top`` and everything below it."""
+        stack = [(top, False)]
+        while stack:
+            node, done = stack.pop()
+            if not node.is_folder:
+                node.size = len(node.content)
+                continue
+            children = node.children
+            if not done:
+                stack.append((node, True))
+                stack.extend((c, False) for c in children)
+                continue
+            node.notes = sum(c.notes if c.is_folder else 1 for c in children)
+            node.size = sum(c.size for c in children)
+            node.modified = max([node.modified] + [c.modified for c in children])
+
+    @staticmethod
+    def totals(node):
+        """(notes, size) that ``node`` contributes to its ancestors."""
+        if node.is_folder:
+            return node.notes, node.size
+        return 1, node.size
+
+    # ---------- Propagation ----------
+    def _bump(self, folder_id, d_notes: int, d_size: int, modified=None):
+        """Add the deltas to ``folder_id`` and every folder above it."""
+        tree = self.tree
+        while folder_id is not None:
+            node = tree.get(folder_id)
+            if node is None:
+                return  # deleted later in the same batch
+            node.notes += d_notes
+            node.size += d_size
+            if modified and modified > node.modified:
+                node.modified = modified
+            folder_id = tree.parent_id(folder_id)
+
+    def _inside(self, item_id, ids) -> bool:
+        """True if a proper ancestor of ``item_id`` is in ``ids``."""
+        p = self.tree.parent_id(item_id)
+        while p is not None:
+            if p in ids:
+                return True
+            p = self.tree.parent_id(p)
+        return False
+
+    def _on_changes(self, changes):
+        # records are replayed against the final tree: creates are filled
+        # from their final subtree, edits bump the note's final parent. That
+        # only adds up without moves and deletes, or for a single record.
+        if len(changes) > 1 and not {ch["op"] for ch in changes} <= {"create", "edit", "rename"}:
+            self._recount(changes)
+            return
+        tree = self.tree
+        now = time.time()
+        # nodes this batch removed, for earlier records that still name them
+        detached = {}
+        for ch in changes:
+            if ch["op"] == "delete":
+                stack = [ch["node"]]
+                while stack:
+                    n = stack.pop()
+                    detached[n.id] = n
+                    stack.extend(n.children or ())
+        # a folder created in this batch is filled with whatever was created
+        # inside it, so those inner creates must not be counted again
+        created = {ch["id"] for ch in changes if ch["op"] == "create"}
+        for ch in changes:
+            op = ch["op"]
+            node = tree.get(ch["id"]) or detached.get(ch["id"])
+            if op == "create":
+                if self._inside(ch["id"], created):
+                    continue
+                self._fill(node)
+                self._bump(ch["parent"], *self.totals(node), node.modified)
+            elif op == "edit" and ch["id"] in tree:
+                size = len(node.content)
+                d_size, node.size = size - node.size, size
+                self._bump(tree.parent_id(ch["id"]), 0, d_size, node.modified)
+            elif op == "rename":
+                self._bump(tree.parent_id(ch["id"]), 0, 0, now)
+            elif op == "move":
+                notes, size = self.totals(node)
+                self._bump(ch["old"], -notes, -size, now)
+                self._bump(ch["new"], notes, size, now)
+            elif op == "delete":
+                notes, size = self.totals(node)
+                self._bump(ch["parent"], -notes, -size, now)
+
+    def _recount(self, changes):
+        """Totals from the final tree: created subtrees in full, then every
+        folder above a touched spot, deepest first, from its children."""
+        tree = self.tree
+        now = time.time()
+        created = {ch["id"] for ch in changes if ch["op"] == "create"}
+        touched, stamped = set(), set()
+        for ch in changes:
+            op = ch["op"]
+            if op == "create":
+                if ch["id"] in tree and not self._inside(ch["id"], created):
+                    self._fill(tree.get(ch["id"]))
+                touched.add(ch["parent"])
+            elif op == "edit":
+                node = tree.get(ch["id"])
+                if node is not None:
+                    node.size = len(node.content)
+                    touched.add(tree.parent_id(ch["id"]))
+            else:
+                if op == "move" and created and ch["id"] in tree \
+                        and not self._inside(ch["id"], created):
+                    # may have come in with a created subtree: never counted
+                    self._fill(tree.get(ch["id"]))
+                spots = (ch["old"], ch["new"]) if op == "move" else (
+                    (ch["parent"],) if op == "delete" else (tree.parent_id(ch["id"]),))
+                touched.update(spots)
+                stamped.update(spots)
+        # every folder whose subtree changed, with its depth
+        depth = {}
+        for folder_id in touched:
+            chain = []
+            while folder_id is not None and folder_id in tree and folder_id not in depth:
+                chain.append(folder_id)
+                folder_id = tree.parent_id(folder_id)
+            base = -1 if folder_id is None or folder_id not in depth else depth[folder_id]
+            for k, f in enumerate(reversed(chain)):
+                depth[f] = base + 1 + k
+        chains = set()
+        for folder_id in stamped:
+            while folder_id is not None and folder_id in tree and folder_id not in chains:
+                chains.add(folder_id)
+                folder_id = tree.parent_id(folder_id)
+        for folder_id in sorted(depth, key=depth.get, reverse=True):
+            node = tree.get(folder_id)
+            children = node.children
+            node.notes = sum(c.notes if c.is_folder else 1 for c in children)
+            node.size = sum(c.size for c in children)
+            node.modified = max([node.modified] + [c.modified for c in children]
+                                + ([now] if folder_id in chains else []))
@@ -0,0 +1,89 @@
+# =============================
+# store/archive.py
+# =============================
+"""Loading a note archive (the ``store.nodes.to_dict`` shape as JSON) in pieces.
+
+``read_archive`` is the slow, blocking part and belongs on a worker
+thread. ``ArchiveLoader`` then hands out shallow nodes in small batches,
+parents before their children and shallow folders before deep ones, so
+the caller can insert a batch per frame and the browser fills from the
+top. A folder the user opens can jump the queue with ``prioritize``.
+"""
+import heapq
+import json
+import os
+from itertools import count
+
+from store.nodes import node_from_dict
+
+LOAD_BATCH = 200        # nodes per next_batch() call
+
+
+def read_archive(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_archive(path: str, data: dict, indent=None):
+    """Write ``data`` as JSON, replacing ``path`` only once it is complete."""
+    tmp = f"{path}.{os.getpid()}.part"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent,
+                  separators=None if indent else (",", ":"))
+    os.replace(tmp, path)
+
+
+class ArchiveLoader:
+    """Hands out the archive's nodes as ``(parent id, Node)`` pairs.
+
+    The archive's own root is not handed out: its children go under
+    ``root_id``, the root of the tree already on screen. Folders are
+    queued when their node is handed out, so every parent is in the
+    caller's tree before any of its children arrive.
+    """
+
+    def __init__(self, data: dict, root_id: str):
+        self.loaded = 0
+        self._seq = count()
+        self._heap = []         # (priority, seq, folder id); stale entries skipped
+        self._pending = {}      # folder id -> [child dicts, next index, depth]
+        self._queue(root_id, data, 0)
+
+    @property
+    def done(self) -> bool:
+        return not self._pending
+
+    def _queue(self, folder_id: str, d: dict, depth: int):
+        children = d.get("children")
+        if children:
+            self._pending[folder_id] = [children, 0, depth]
+            heapq.heappush(self._heap, (depth, next(self._seq), folder_id))
+
+    def prioritize(self, folder_id: str):
+        """Hand out what is left of ``folder_id`` before anything else."""
+        if folder_id in self._pending:
+            heapq.heappush(self._heap, (-1, next(self._seq), folder_id))
+
+    def next_batch(self, size: int = LOAD_BATCH) -> list:
+        out = []
+        heap = self._heap
+        while heap and len(out) < size:
+            top = heapq.heappop(heap)
+            folder_id = top[2]
+            entry = self._pending.get(folder_id)
+            if entry is None:
+                continue    # finished through an earlier (prioritized) entry
+            children, start, depth = entry
+            end = min(len(children), start + size - len(out))
+            for cd in children[start:end]:
+                node = node_from_dict(cd)
+                out.append((folder_id, node))
+                if node.is_folder:
+                    self._queue(node.id, cd, depth + 1)
+            if end < len(children):
+                entry[1] = end
+                heapq.heappush(heap, top)
+            else:
+                del self._pending[folder_id]
+        self.loaded += len(out)
+        return out
@@ -0,0 +1,175 @@
+# =============================
+# store/attachments.py
+# =============================
+"""Image attachments: content-addressed originals plus a thumbnail cache.
+
+A note refers to a picture with a Markdown link, ``![caption](att:<key>)``,
+where the key is the file's SHA-256 and extension. Originals are copied
+once into ``<root>/files``; thumbnails go to ``<root>/thumbs`` as
+``<sha>_<px>.png``, so they survive restarts and are shared by every note
+that shows the same picture. Type sniffing, hashing, decoding and scaling
+run on a small thread pool and results come back as paths through
+``post`` (e.g. onto the Kivy thread). Originals are only decoded for a
+thumbnail, or when the user opens one.
+"""
+import hashlib
+import os
+import re
+import shutil
+import threading
+
+THUMB_WORKERS = 2
+# Formats Pillow decodes everywhere -> extension used in the key
+IMAGE_TYPES = {"image/jpeg": "jpg", "image/png": "png", "image/gif": "gif",
+               "image/webp": "webp", "image/bmp": "bmp"}
+_REF = re.compile(r"!\[([^\]\n]*)\]\(att:([0-9a-f]{64}\.[a-z0-9]+)\)")
+_REF_CHARS = frozenset("![]():")
+
+
+def refs(text: str) -> list:
+    """Attachment keys referenced in ``text``, first use order, no repeats."""
+    return list(dict.fromkeys(m.group(2) for m in _REF.finditer(text)))
+
+
+def first_ref(text: str) -> str:
+    m = _REF.search(text)
+    return m.group(2) if m else ""
+
+
+def ref_may_change(text: str, edit, current: str) -> bool:
+    """Can ``edit`` (pos, deleted, inserted) have changed ``first_ref(text)``?
+
+    Only if it touches link syntax, or lands at or before the end of the
+    current first reference; anywhere else the answer is ``current``.
+    """
+    pos, deleted, inserted = edit
+    if not _REF_CHARS.isdisjoint(deleted) or not _REF_CHARS.isdisjoint(inserted):
+        return True
+    if not current:
+        return False
+    at = text.find(current)
+    return at < 0 or pos <= at + len(current)
+
+
+def markdown_ref(key: str, caption: str = "") -> str:
+    return f"![{caption}](att:{key})"
+
+
+class AttachmentStore:
+    """Attachment files under ``root`` and their thumbnails.
+
+    ``post(fn)`` must run ``fn`` on the caller's thread; by default it runs
+    it on the worker. Each thumbnail is made at most once at a time:
+    concurrent requests for the same one share the job.
+    """
+
+    def __init__(self, root: str, post=None, workers: int = THUMB_WORKERS):
+        self.files = os.path.join(root, "files")
+        self.thumbs = os.path.join(root, "thumbs")
+        os.makedirs(self.files, exist_ok=True)
+        os.makedirs(self.thumbs, exist_ok=True)
+        from concurrent.futures import ThreadPoolExecutor  # not needed by the link helpers
+
+        self.post = post or (lambda fn: fn())
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="attachments")
+        self._lock = threading.Lock()
+        self._ready = set()     # (key, px) thumbnails known to be on disk
+        self._failed = set()    # keys that did not decode; not retried
+        self._waiting = {}      # (key, px) -> callbacks for the job in flight
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.files, key)
+
+    def thumb_path(self, key: str, px: int) -> str:
+        return os.path.join(self.thumbs, f"{key.split('.')[0]}_{px}.png")
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    # ---------- Import ----------
+    def add(self, src: str, on_done, on_error=None):
+        """Copy the image at ``src`` in; ``on_done(key)`` once it is stored."""
+        def job():
+            try:
+                key = self._store(src)
+            except (OSError, ValueError) as exc:
+                if on_error is not None:
+                    self.post(lambda exc=exc: on_error(exc))
+                return
+            self.post(lambda: on_done(key))
+
+        self._pool.submit(job)
+
+    def _store(self, src: str) -> str:
+        import filetype
+
+        kind = filetype.guess(src)  # reads the header only
+        if kind is None or kind.mime not in IMAGE_TYPES:
+            raise ValueError(f"not a supported image: {src}")
+        digest = hashlib.sha256()
+        with open(src, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        key = f"{digest.hexdigest()}.{IMAGE_TYPES[kind.mime]}"
+        dest = self.path(key)
+        if not os.path.exists(dest):
+            tmp = f"{dest}.{threading.get_ident()}.part"
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, dest)
+        return key
+
+    # ---------- Thumbnails ----------
+    def thumbnail(self, key: str, px: int, on_done):
+        """``on_done(path)`` with a thumbnail of ``key`` fitting ``px`` x ``px``.
+
+        Called at once if the thumbnail is known to be on disk, else through
+        ``post`` when a worker has found or made it. Never called for an
+        attachment that is missing or does not decode.
+        """
+        job = (key, px)
+        with self._lock:
+            if key in self._failed:
+                return
+            ready = job in self._ready
+            if not ready:
+                waiting = self._waiting.get(job)
+                if waiting is not None:
+                    waiting.append(on_done)
+                    return
+                self._waiting[job] = [on_done]
+        if ready:
+            on_done(self.thumb_path(key, px))
+        else:
+            self._pool.submit(self._thumb_job, key, px)
+
+    def _thumb_job(self, key: str, px: int):
+        try:
+            path = self._make_thumb(key, px)
+        except Exception:   # missing file, truncated or unsupported image
+            path = None
+        with self._lock:
+            callbacks = self._waiting.pop((key, px), [])
+            if path is None:
+                self._failed.add(key)
+            else:
+                self._ready.add((key, px))
+        if path is not None:
+            for cb in callbacks:
+                self.post(lambda cb=cb: cb(path))
+
+    def _make_thumb(self, key: str, px: int) -> str:
+        dest = self.thumb_path(key, px)
+        if os.path.exists(dest):
+            return dest
+        from PIL import Image, ImageOps
+
+        with Image.open(self.path(key)) as im:
+            im.draft("RGB", (px, px))   # JPEG: decode straight at a reduced scale
+            thumb = ImageOps.exif_transpose(im)
+            thumb.thumbnail((px, px))
+            if thumb.mode not in ("RGB", "RGBA"):
+                thumb = thumb.convert("RGBA")
+            tmp = f"{dest}.{threading.get_ident()}.part"
+            thumb.save(tmp, "PNG")
+            os.replace(tmp, dest)
+        return dest
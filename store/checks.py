@@ -0,0 +1,207 @@
+# =============================
+# store/checks.py
+# =============================
+"""Randomised consistency checks of the notes data layer, headless.
+
+    python -m store.checks          # regression suite, exit 1 on failure
+"""
+import random
+import sys
+from time import perf_counter
+
+from store.aggregates import FolderAggregates
+from store.nodes import FOLDER, NOTE, Node
+from store.sync import SyncClient, SyncTracker
+from store.sync_server import InProcessSession, SyncServer
+from store.tree import NoteTree
+
+
+def _words(rng) -> str:
+    return " ".join(rng.choice(("planche", "lever", "dips", "rest", "ring"))
+                    for _ in range(rng.randint(0, 6)))
+
+
+def _recount(tree) -> list:
+    """Folders whose cached totals differ from a count of the tree."""
+    wrong, counts = [], {}
+    for item_id in reversed(tree.subtree_ids(tree.root.id)):   # children first
+        node = tree.get(item_id)
+        if not node.is_folder:
+            counts[item_id] = (1, len(node.content))
+            continue
+        got = [counts[c.id] for c in node.children]
+        counts[item_id] = (sum(n for n, _ in got), sum(s for _, s in got))
+        if (node.notes, node.size) != counts[item_id]:
+            wrong.append((item_id, (node.notes, node.size), counts[item_id]))
+    return wrong
+
+
+def _random_op(tree, rng, n, max_nodes=300):
+    ids = tree.subtree_ids(tree.root.id)
+    folders = [i for i in ids if tree.get(i).is_folder]
+    items = ids[1:]
+    ops = ("create", "insert", "duplicate", "move", "delete", "rename", "edit")
+    op = "delete" if len(ids) > max_nodes else rng.choice(ops)
+    if op == "create" or not items:
+        tree.create(rng.choice(folders), rng.choice(("note", "folder")), f"c{n}")
+    elif op == "insert":
+        top = Node(f"i{n}", f"i{n}", FOLDER, 0.0)
+        for k in range(rng.randint(0, 3)):
+            top.children.append(Node(f"i{n}.{k}", "x", NOTE, 0.0, content=_words(rng)))
+        tree.insert(top, rng.choice(folders))
+    elif op == "duplicate":
+        tree.duplicate(rng.sample(items, min(len(items), rng.randint(1, 2))))
+    elif op == "move":
+        tree.move(rng.sample(items, min(len(items), rng.randint(1, 3))), rng.choice(folders))
+    elif op == "delete":
+        tree.delete([rng.choice(items)])
+    elif op == "rename":
+        tree.rename(rng.choice(items), f"r{n}")
+    else:
+        notes = [i for i in items if not tree.get(i).is_folder]
+        if notes:
+            tree.set_content(rng.choice(notes), _words(rng))
+
+
+# ---------- Checks ----------
+def check_aggregates(batches=2000, seed=0):
+    """Random batches of 1-6 operations; totals must match a full recount."""
+    rng = random.Random(seed)
+    tree = NoteTree(Node("root", "", FOLDER, 0.0))
+    FolderAggregates(tree)
+    n = 0
+    for b in range(batches):
+        with tree.transaction():
+            for _ in range(rng.randint(1, 6)):
+                n += 1
+                _random_op(tree, rng, n)
+        wrong = _recount(tree)
+        if wrong:
+            return False, f"batch {b}: {wrong[:3]}"
+    return True, f"{batches} batches, {len(tree)} nodes"
+
+
+def check_aggregates_create_then_move():
+    """A folder created and filled by a move in one batch (a sync apply)."""
+    tree = NoteTree(Node("root", "", FOLDER, 0.0))
+    tree.insert(Node("n1", "n1", NOTE, 0.0, content="hello"), "root")
+    FolderAggregates(tree)
+    with tree.transaction():
+        tree.insert(Node("F", "F", FOLDER, 0.0), "root")
+        tree.move(["n1"], "F")
+    got = [(tree.get(i).notes, tree.get(i).size) for i in ("root", "F")]
+    return got == [(1, 5), (1, 5)], f"root, F = {got}"
+
+
+# ---------- Sync ----------
+def _replicas(count, seed_nodes=()):
+    """``count`` (tree, client) pairs on one in-process server, same start."""
+    server = SyncServer()
+    out = []
+    for k in range(count):
+        tree = NoteTree(Node("root", "", FOLDER, 0.0))
+        for item_id, kind, parent in seed_nodes:
+            tree.insert(Node(item_id, item_id, kind, 0.0), parent)
+        FolderAggregates(tree)
+        client = SyncClient(SyncTracker(tree, f"d{k}"), "local://",
+                            session=InProcessSession(server))
+        client.sync()   # first exchange: pull only
+        out.append((tree, client))
+    return out
+
+
+def _snapshot(tree) -> dict:
+    return {i: (tree.parent_id(i), tree.get(i).name, tree.get(i).content)
+            for i in tree.subtree_ids(tree.root.id)}
+
+
+def _settle(replicas, rounds=20) -> bool:
+    """Sync round-robin until a whole round moves nothing; True if it did."""
+    for _ in range(rounds):
+        busy = False
+        for _, client in replicas:
+            result = client.sync()
+            busy = busy or result.sent or result.applied
+        if not busy:
+            return True
+    return False
+
+
+def _converged(replicas):
+    if not _settle(replicas):
+        return False, "still exchanging changes after 20 rounds"
+    first = _snapshot(replicas[0][0])
+    for k, (tree, _) in enumerate(replicas[1:], 1):
+        other = _snapshot(tree)
+        if other != first:
+            diff = sorted(i for i in first.keys() | other.keys() if first.get(i) != other.get(i))
+            return False, f"replica {k} differs in {len(diff)} ids, e.g. {diff[:3]}"
+        wrong = _recount(tree)
+        if wrong:
+            return False, f"replica {k} totals: {wrong[:2]}"
+    return True, f"{len(first)} nodes on {len(replicas)} replicas"
+
+
+def check_sync_cross_move():
+    """A moves X into Y while B moves Y into X: both must end up alike."""
+    (a, ca), (b, cb) = _replicas(2, [("X", FOLDER, "root"), ("Y", FOLDER, "root")])
+    a.move(["X"], "Y")
+    b.move(["Y"], "X")
+    ca.sync()
+    cb.sync()
+    return _converged([(a, ca), (b, cb)])
+
+
+def check_sync_delete_vs_create():
+    """A deletes folder X while B creates a note in it: the note survives."""
+    (a, ca), (b, cb) = _replicas(2, [("X", FOLDER, "root")])
+    cb.sync()
+    a.delete(["X"])
+    ca.sync()
+    note = b.create("X", "note", "written offline")
+    cb.sync()
+    ok, detail = _converged([(a, ca), (b, cb)])
+    if ok and note.id not in a:
+        return False, "the new note was lost"
+    return ok, detail
+
+
+def check_sync_fuzz(steps=600, seeds=3):
+    """Three replicas doing random edits and syncing at random converge."""
+    for seed in range(seeds):
+        rng = random.Random(seed)
+        replicas = _replicas(3)
+        for n in range(steps):
+            tree, client = rng.choice(replicas)
+            with tree.transaction():
+                _random_op(tree, rng, n, max_nodes=80)
+            if rng.random() < 0.3:
+                rng.choice(replicas)[1].sync()
+        ok, detail = _converged(replicas)
+        if not ok:
+            return False, f"seed {seed}: {detail}"
+    return True, f"{seeds} runs, {detail}"
+
+
+SUITE = [
+    ("aggregates: create + move in one batch", check_aggregates_create_then_move),
+    ("aggregates: 2000 random batches vs recount", check_aggregates),
+    ("sync: cross moves converge", check_sync_cross_move),
+    ("sync: delete vs create in the folder", check_sync_delete_vs_create),
+    ("sync: 3 replicas, 600 random ops", check_sync_fuzz),
+]
+
+
+def main(argv=None) -> int:
+    t0 = perf_counter()
+    failed = 0
+    for name, check in SUITE:
+        ok, detail = check()
+        failed += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name:<50} {detail}")
+    print(f"suite took {perf_counter() - t0:.2f} s of wall time")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,285 @@
+# =============================
+# store/cli.py
+# =============================
+"""Headless access to a note archive: no Kivy, no window.
+
+Works on the JSON archive the app reads (``RC_ARCHIVE``, or ``--archive``)
+and imports only the store modules it needs, so it starts in a few tens
+of milliseconds, e.g. for nightly backups on a server.
+
+    python -m store.cli list /Calisthenics -r
+    python -m store.cli search "front lever"
+    python -m store.cli export backup.json          # or: --markdown backup/
+    python -m store.cli import old_notes/ --into /Imported
+    python -m store.cli stats
+
+Folders are addressed by their name path from the root ("/" is the root).
+Only ``import`` writes to the archive; don't run it while the app is open
+on the same file.
+"""
+import argparse
+import os
+import re
+import sys
+from datetime import datetime
+
+from store.archive import read_archive, write_archive
+from store.nodes import FOLDER, NOTE, Node, from_dict, to_dict
+from store.tree import NoteTree, new_id
+
+ARCHIVE_ENV = "RC_ARCHIVE"      # same variable as the app
+NOTE_SUFFIXES = (".md", ".txt")
+_UNSAFE = re.compile(r'[\\/:*?"<>|\x00-\x1f]+')
+
+
+class CliError(Exception):
+    """Bad input; printed without a traceback."""
+
+
+# ---------- Archive + tree ----------
+def _open(path: str) -> NoteTree:
+    if not path:
+        raise CliError(f"no archive: pass --archive or set {ARCHIVE_ENV}")
+    try:
+        return NoteTree(from_dict(read_archive(path)))
+    except OSError as exc:
+        raise CliError(f"cannot read {path}: {exc.strerror}")
+    except (ValueError, KeyError) as exc:
+        raise CliError(f"{path} is not a note archive ({exc})")
+
+
+def _folder(tree: NoteTree, path: str) -> Node:
+    node = tree.root
+    for part in (p for p in path.split("/") if p):
+        node = next((c for c in node.children if c.is_folder and c.name == part), None)
+        if node is None:
+            raise CliError(f"no folder {path!r}")
+    return node
+
+
+def _make_folders(tree: NoteTree, path: str) -> Node:
+    """The folder at ``path``, creating any missing ones along the way."""
+    node = tree.root
+    for part in (p for p in path.split("/") if p):
+        child = next((c for c in node.children if c.is_folder and c.name == part), None)
+        if child is None:
+            child = Node(new_id("folder"), part, FOLDER, datetime.now().timestamp())
+            tree.insert(child, node.id)
+        node = child
+    return node
+
+
+def _path(tree: NoteTree, item_id: str) -> str:
+    return "/" + "/".join(tree.get(i).name for i in tree.path(item_id))
+
+
+def _when(ts: float) -> str:
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M")
+
+
+# ---------- Commands ----------
+def cmd_list(tree: NoteTree, args):
+    """One line per item: type, modified, words or item count, path."""
+    top = _folder(tree, args.folder)
+    stack = list(reversed(top.children))
+    while stack:
+        node = stack.pop()
+        if node.is_folder:
+            count = f"{len(node.children)} items"
+            if args.recursive:
+                stack.extend(reversed(node.children))
+        else:
+            count = f"{len(node.content.split())} words"
+        kind = "d" if node.is_folder else "-"
+        print(f"{kind}  {_when(node.modified)}  {count:>12}  {_path(tree, node.id)}")
+
+
+def cmd_search(tree: NoteTree, args):
+    if args.body:
+        needle = args.query.lower()
+        hits = [n.id for _, n in _walk(tree.root)
+                if not n.is_folder and needle in n.content.lower()][:args.limit]
+    else:
+        from store.titles import TitleIndex
+        hits = TitleIndex(tree).search(args.query, args.limit)
+    for item_id in hits:
+        print(_path(tree, item_id))
+    return 0 if hits else 1
+
+
+def cmd_export(tree: NoteTree, args):
+    top = _folder(tree, args.folder)
+    if args.markdown:
+        written = _export_markdown(top, args.out)
+        print(f"{args.out}: {written} notes", file=sys.stderr)
+    elif args.out == "-":
+        import json
+        json.dump(to_dict(top), sys.stdout, ensure_ascii=False, indent=args.indent)
+        sys.stdout.write("\n")
+    else:
+        write_archive(args.out, to_dict(top), indent=args.indent)
+
+
+def _export_markdown(top: Node, out: str) -> int:
+    """Folders as directories, notes as .md files with their modified time."""
+    written = 0
+    stack = [(top, out)]
+    while stack:
+        folder, dirname = stack.pop()
+        os.makedirs(dirname, exist_ok=True)
+        taken = set()
+        for child in folder.children:
+            base = _UNSAFE.sub("_", child.name).strip(" .") or "Untitled"
+            name, n = base, 1
+            while name.lower() in taken:
+                n += 1
+                name = f"{base} ({n})"
+            taken.add(name.lower())
+            if child.is_folder:
+                stack.append((child, os.path.join(dirname, name)))
+                continue
+            path = os.path.join(dirname, name + ".md")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(child.content)
+            os.utime(path, (child.modified, child.modified))
+            written += 1
+    return written
+
+
+def cmd_import(tree: NoteTree, args):
+    """Add an archive's, or a directory's, contents to a folder of this one.
+
+    ``--into`` folders that do not exist yet are created.
+    """
+    if os.path.isdir(args.source):
+        source = _read_directory(args.source)
+    else:
+        try:
+            source = from_dict(read_archive(args.source))
+        except OSError as exc:
+            raise CliError(f"cannot read {args.source}: {exc.strerror}")
+        except (ValueError, KeyError) as exc:
+            raise CliError(f"{args.source} is not a note archive ({exc})")
+    # an archive's root stands for the destination; a lone note comes in as is
+    items = source.children if source.is_folder else [source]
+    nodes = [n for item in items for n in [item] + [n for _, n in _walk(item)]]
+    # keep ids (so a re-import can be spotted) unless they clash with ours
+    seen = set()
+    for node in nodes:
+        if node.id in tree or node.id in seen:
+            node.id = new_id(node.type)
+        seen.add(node.id)
+    with tree.transaction():
+        dest = _make_folders(tree, args.into)
+        for item in items:
+            tree.insert(item, dest.id)
+    write_archive(args.archive, to_dict(tree.root))
+    notes = sum(1 for n in nodes if n.kind == NOTE)
+    print(f"imported {notes} notes, {len(nodes) - notes} folders "
+          f"into {_path(tree, dest.id)}", file=sys.stderr)
+
+
+def _read_directory(top: str) -> Node:
+    """A folder tree from a directory: subdirectories and .md/.txt notes."""
+    root = Node(new_id("folder"), os.path.basename(top.rstrip(os.sep)), FOLDER,
+                os.stat(top).st_mtime)
+    stack = [(root, top)]
+    while stack:
+        folder, dirname = stack.pop()
+        for entry in sorted(os.scandir(dirname), key=lambda e: e.name.lower()):
+            if entry.name.startswith("."):
+                continue
+            mtime = entry.stat().st_mtime
+            if entry.is_dir():
+                child = Node(new_id("folder"), entry.name, FOLDER, mtime)
+                stack.append((child, entry.path))
+            elif entry.name.lower().endswith(NOTE_SUFFIXES):
+                with open(entry.path, encoding="utf-8", errors="replace") as f:
+                    text = f.read()
+                child = Node(new_id("note"), os.path.splitext(entry.name)[0], NOTE,
+                             mtime, content=text)
+            else:
+                continue
+            folder.children.append(child)
+    return root
+
+
+def cmd_stats(tree: NoteTree, args):
+    from store.aggregates import FolderAggregates
+    FolderAggregates(tree)
+    root = tree.root
+    depth, words, biggest = 0, 0, []
+    for level, node in _walk(root):
+        depth = max(depth, level)
+        if not node.is_folder:
+            words += len(node.content.split())
+            biggest.append((node.size, node.id))
+    folders = len(tree) - root.notes - 1
+    print(f"notes     {root.notes}")
+    print(f"folders   {folders}")
+    print(f"words     {words}")
+    print(f"chars     {root.size}")
+    print(f"depth     {depth}")
+    if root.notes:
+        print(f"modified  {_when(root.modified)}")
+        print("largest")
+        for size, item_id in sorted(biggest, reverse=True)[:5]:
+            print(f"  {size:>9}  {_path(tree, item_id)}")
+
+
+def _walk(top: Node):
+    """(depth, node) for everything below ``top``."""
+    stack = [(0, c) for c in reversed(top.children or ())]
+    while stack:
+        level, node = stack.pop()
+        yield level + 1, node
+        stack.extend((level + 1, c) for c in reversed(node.children or ()))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m store.cli",
+                                     description="Work with a note archive without the app.")
+    parser.add_argument("--archive", default=os.environ.get(ARCHIVE_ENV),
+                        help=f"archive JSON (default: ${ARCHIVE_ENV})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("list", help="items in a folder")
+    p.add_argument("folder", nargs="?", default="/")
+    p.add_argument("-r", "--recursive", action="store_true")
+    p.set_defaults(run=cmd_list)
+
+    p = sub.add_parser("search", help="ranked name search (or --body text)")
+    p.add_argument("query")
+    p.add_argument("-n", "--limit", type=int, default=20)
+    p.add_argument("--body", action="store_true", help="search note text instead")
+    p.set_defaults(run=cmd_search)
+
+    p = sub.add_parser("export", help="write a folder as JSON or Markdown files")
+    p.add_argument("out", help='file, "-" for stdout, or a directory with --markdown')
+    p.add_argument("--folder", default="/")
+    p.add_argument("--markdown", action="store_true")
+    p.add_argument("--indent", type=int, default=None)
+    p.set_defaults(run=cmd_export)
+
+    p = sub.add_parser("import", help="add an archive or a directory of .md/.txt")
+    p.add_argument("source")
+    p.add_argument("--into", default="/", help="destination folder, created if missing")
+    p.set_defaults(run=cmd_import)
+
+    p = sub.add_parser("stats", help="counts, sizes, largest notes")
+    p.set_defaults(run=cmd_stats)
+
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "import" and args.archive and not os.path.exists(args.archive):
+            tree = NoteTree(Node("root", "", FOLDER, datetime.now().timestamp()))
+        else:
+            tree = _open(args.archive)
+        return args.run(tree, args) or 0
+    except CliError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
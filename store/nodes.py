@@ -0,0 +1,137 @@
+# =============================
+# store/nodes.py
+# =============================
+"""Compact note-tree nodes.
+
+A ``Node`` keeps its fields in ``__slots__`` instead of a per-node dict:
+names are interned, timestamps are epoch floats and the type is a small
+int. ``from_dict``/``to_dict`` convert to and from the nested-dict shape
+used for seeding and export.
+
+    python -m store.nodes      # bytes per node, dict vs Node
+"""
+import sys
+from datetime import datetime
+
+FOLDER, NOTE = 0, 1
+KIND_NAMES = ("folder", "note")
+KIND_CODES = {"folder": FOLDER, "note": NOTE}
+
+
+class Node:
+    __slots__ = ("id", "name", "kind", "created", "modified", "content", "children",
+                 # derived, kept up to date by store.previews / store.aggregates
+                 "snippet", "words", "image", "size", "notes")
+
+    def __init__(self, id: str, name: str, kind: int, created: float,
+                 modified=None, content=None):
+        self.id = id
+        self.name = sys.intern(name)
+        self.kind = kind
+        self.created = created
+        self.modified = created if modified is None else modified
+        if kind == FOLDER:
+            self.content, self.children = None, []
+        else:
+            self.content, self.children = content or "", None
+        self.snippet, self.words, self.image = "", 0, ""
+        self.size, self.notes = 0, 0
+
+    # ---------- Accessors ----------
+    @property
+    def is_folder(self) -> bool:
+        return self.kind == FOLDER
+
+    @property
+    def type(self) -> str:
+        """"folder" or "note", for display and the sync/export formats."""
+        return KIND_NAMES[self.kind]
+
+    def __repr__(self):
+        return f"Node({self.id!r}, {self.name!r}, {self.type})"
+
+
+def _epoch(value) -> float:
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    return float(value)
+
+
+def node_from_dict(d: dict) -> Node:
+    """One node from its dict, without the children."""
+    return Node(d["id"], d["name"], KIND_CODES[d["type"]], _epoch(d["created"]),
+                _epoch(d["modified"]) if "modified" in d else None,
+                d.get("content"))
+
+
+def from_dict(data: dict) -> Node:
+    """Node tree from nested dicts (``type``, ISO or epoch ``created``, ...)."""
+    top = node_from_dict(data)
+    stack = [(top, data)]
+    while stack:
+        node, d = stack.pop()
+        for cd in d.get("children", ()):
+            child = node_from_dict(cd)
+            node.children.append(child)
+            stack.append((child, cd))
+    return top
+
+
+def to_dict(node: Node) -> dict:
+    """Nested plain dicts (ISO timestamps), e.g. for JSON export."""
+    def plain(n):
+        d = {"id": n.id, "name": n.name, "type": n.type,
+             "created": datetime.fromtimestamp(n.created).isoformat(),
+             "modified": datetime.fromtimestamp(n.modified).isoformat()}
+        if n.is_folder:
+            d["children"] = []
+        else:
+            d["content"] = n.content
+        return d
+
+    top = plain(node)
+    stack = [(node, top)]
+    while stack:
+        n, d = stack.pop()
+        for child in n.children or ():
+            cd = plain(child)
+            d["children"].append(cd)
+            stack.append((child, cd))
+    return top
+
+
+# ---------- Benchmark ----------
+def _bench(count: int = 100_000):
+    import tracemalloc
+    from store.tree import new_id
+
+    now = datetime.now()
+
+    def measure(build):
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        kept = build()
+        used = tracemalloc.get_traced_memory()[0] - base
+        tracemalloc.stop()
+        del kept
+        return used / count
+
+    def dicts():
+        # what RCApp.fs held: a dict per node, ISO strings, a type string
+        return [{"id": new_id("note"), "name": f"Session {i % 500}", "type": "note",
+                 "created": now.isoformat(), "modified": now.isoformat(),
+                 "content": "", "snippet": "", "words": 0, "size": 0}
+                for i in range(count)]
+
+    def nodes():
+        return [Node(new_id("note"), f"Session {i % 500}", NOTE, now.timestamp())
+                for i in range(count)]
+
+    d, n = measure(dicts), measure(nodes)
+    print(f"{count} empty notes (500 distinct names), ids included")
+    print(f"  dict  {d:7.1f} bytes/node")
+    print(f"  Node  {n:7.1f} bytes/node   saved {d - n:.1f} ({(d - n) / d:.0%})")
+
+
+if __name__ == "__main__":
+    _bench()
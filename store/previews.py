@@ -0,0 +1,84 @@
+# =============================
+# store/previews.py
+# =============================
+import re
+
+from store.attachments import first_ref, ref_may_change
+
+SNIPPET_CHARS = 90
+SNIPPET_SCAN = 400      # only edits before this offset can change the snippet
+_WORD = re.compile(r"\S+")
+_SPACE = re.compile(r"\s+")
+
+
+def snippet_of(text: str) -> str:
+    return _SPACE.sub(" ", text[:SNIPPET_SCAN]).strip()[:SNIPPET_CHARS]
+
+
+def word_count_delta(text: str, pos: int, deleted: str, inserted: str) -> int:
+    """Change in word count for an edit, looking only around the edited range.
+
+    ``text`` is the body after the edit. The window is widened to the
+    nearest whitespace on both sides, so words split or joined by the edit
+    are counted correctly.
+    """
+    left = pos
+    while left > 0 and not text[left - 1].isspace():
+        left -= 1
+    right = pos + len(inserted)
+    while right < len(text) and not text[right].isspace():
+        right += 1
+    before = text[left:pos]
+    after = text[pos + len(inserted):right]
+    old = len(_WORD.findall(before + deleted + after))
+    new = len(_WORD.findall(before + inserted + after))
+    return new - old
+
+
+class PreviewCache:
+    """Keeps ``snippet``, ``words`` and ``image`` (the first attachment key,
+    see store/attachments.py) on every note node.
+
+    The derived fields sit next to the node's other metadata, so the
+    browser draws tiles without touching ``content``. Bodies are scanned
+    once when the cache is attached; after that an edit that carries its
+    diff range costs O(edit), not O(note).
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        tree.listeners.append(self._on_changes)
+        for item_id in tree.subtree_ids(tree.root.id):
+            node = tree.get(item_id)
+            if not node.is_folder:
+                self._derive(node)
+
+    @staticmethod
+    def _derive(node):
+        text = node.content
+        node.snippet = snippet_of(text)
+        node.words = len(_WORD.findall(text))
+        node.image = first_ref(text)
+
+    def _on_changes(self, changes):
+        for ch in changes:
+            if ch["op"] == "create":
+                if ch["id"] not in self.tree:
+                    continue  # deleted again later in the same batch
+                for sid in self.tree.subtree_ids(ch["id"]):
+                    node = self.tree.get(sid)
+                    if not node.is_folder:
+                        self._derive(node)
+            elif ch["op"] == "edit":
+                node = self.tree.get(ch["id"])
+                edit = ch.get("edit")
+                if edit is None:
+                    self._derive(node)
+                    continue
+                pos, deleted, inserted = edit
+                text = node.content
+                node.words += word_count_delta(text, pos, deleted, inserted)
+                if pos < SNIPPET_SCAN:
+                    node.snippet = snippet_of(text)
+                if ref_may_change(text, edit, node.image):
+                    node.image = first_ref(text)
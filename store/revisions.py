@@ -0,0 +1,193 @@
+# =============================
+# store/revisions.py
+# =============================
+"""Per-note revision history on content-addressed, zlib-compressed blobs.
+
+A note body is cut into line-aligned blocks at content-defined boundaries,
+so an edit only changes the blocks it touches. Blocks are stored once by
+SHA-256 (identical blocks are shared across revisions and notes). Each
+revision's block list is stored as a delta against the previous one, with
+a full list every KEYFRAME_EVERY revisions to bound reconstruction.
+Listing reads only the uncompressed Revision records.
+"""
+import difflib
+import hashlib
+import json
+import zlib
+from collections import namedtuple
+
+BLOCK_MAX = 2048        # chars; longer runs are split at this size
+BOUNDARY_MASK = 7       # ~1 in 8 lines ends a block
+KEYFRAME_EVERY = 32
+
+# size: chars in the note; added/removed: chars in new/dropped blocks;
+# manifest: blob id of the (delta or full) block list for this revision
+Revision = namedtuple("Revision", "number ts size added removed manifest")
+
+
+class BlobStore:
+    """Content-addressed blobs; ``blobs`` is any bytes mapping (dict by default)."""
+
+    def __init__(self, blobs=None):
+        self.blobs = {} if blobs is None else blobs
+        self.stored_bytes = 0
+
+    def put(self, data: bytes) -> str:
+        key = hashlib.sha256(data).hexdigest()
+        if key not in self.blobs:
+            packed = zlib.compress(data)
+            self.blobs[key] = packed
+            self.stored_bytes += len(packed)
+        return key
+
+    def get(self, key: str) -> bytes:
+        return zlib.decompress(self.blobs[key])
+
+    def drop(self, key: str):
+        packed = self.blobs.pop(key, None)
+        if packed is not None:
+            self.stored_bytes -= len(packed)
+
+
+def split_blocks(text: str) -> list:
+    blocks = []
+    cur = []
+    size = 0
+    for line in text.splitlines(keepends=True):
+        while len(line) > BLOCK_MAX:
+            if cur:
+                blocks.append("".join(cur))
+                cur, size = [], 0
+            blocks.append(line[:BLOCK_MAX])
+            line = line[BLOCK_MAX:]
+        cur.append(line)
+        size += len(line)
+        if size >= BLOCK_MAX or (zlib.crc32(line.encode("utf-8")) & BOUNDARY_MASK) == 0:
+            blocks.append("".join(cur))
+            cur, size = [], 0
+    if cur:
+        blocks.append("".join(cur))
+    return blocks
+
+
+class RevisionStore:
+    """Revisions of many notes over one BlobStore.
+
+    Blobs are reference counted per note, so ``forget`` can release the
+    ones no other note uses; the BlobStore must not be shared with anything
+    else.
+    """
+
+    def __init__(self, blobs: BlobStore = None):
+        self.blobs = blobs or BlobStore()
+        self._revisions = {}  # note id -> [Revision]
+        self._heads = {}      # note id -> block list of the latest revision
+        self._keys = {}       # note id -> blob keys its revisions use
+        self._users = {}      # blob key -> number of notes using it
+
+    # ---------- Writing ----------
+    def commit(self, note_id: str, text: str, ts: float):
+        """Record ``text`` as a new revision; None if it equals the latest."""
+        revs = self._revisions.setdefault(note_id, [])
+        prev = self._head(note_id)
+        entries = [[self.blobs.put(b.encode("utf-8")), len(b)] for b in split_blocks(text)]
+        if prev is not None and entries == prev:
+            return None
+
+        number = len(revs) + 1
+        if prev is None:
+            added, removed = sum(n for _, n in entries), 0
+        else:
+            ops, added, removed = self._delta(prev, entries)
+        if prev is None or (number - 1) % KEYFRAME_EVERY == 0:
+            manifest = {"full": entries}    # the +/- counts still compare to prev
+        else:
+            manifest = {"delta": ops}
+        key = self.blobs.put(json.dumps(manifest, separators=(",", ":")).encode("utf-8"))
+        rev = Revision(number, ts, len(text), added, removed, key)
+        revs.append(rev)
+        self._heads[note_id] = entries
+        self._use(note_id, [key] + [h for h, _ in entries])
+        return rev
+
+    def _use(self, note_id: str, keys):
+        mine = self._keys.setdefault(note_id, set())
+        users = self._users
+        for k in keys:
+            if k not in mine:
+                mine.add(k)
+                users[k] = users.get(k, 0) + 1
+
+    def forget(self, note_id: str):
+        """Drop a (deleted) note's history and the blobs only it used."""
+        self._revisions.pop(note_id, None)
+        self._heads.pop(note_id, None)
+        users = self._users
+        for k in self._keys.pop(note_id, ()):
+            users[k] -= 1
+            if not users[k]:
+                del users[k]
+                self.blobs.drop(k)
+
+    @staticmethod
+    def _delta(prev, entries):
+        """Ops turning block list ``prev`` into ``entries``: copy ranges + new blocks."""
+        ops = []
+        added = removed = 0
+        sm = difflib.SequenceMatcher(None, [h for h, _ in prev], [h for h, _ in entries],
+                                     autojunk=False)
+        for tag, i1, i2, j1, j2 in sm.get_opcodes():
+            if tag == "equal":
+                ops.append(["c", i1, i2 - i1])
+                continue
+            removed += sum(n for _, n in prev[i1:i2])
+            if j2 > j1:
+                ops.append(["a", entries[j1:j2]])
+                added += sum(n for _, n in entries[j1:j2])
+        return ops, added, removed
+
+    # ---------- Reading ----------
+    def list(self, note_id: str) -> list:
+        """Revisions oldest first; nothing is decompressed."""
+        return list(self._revisions.get(note_id, ()))
+
+    def text(self, note_id: str, number: int) -> str:
+        return "".join(self.blobs.get(h).decode("utf-8")
+                       for h, _ in self._entries(note_id, number))
+
+    def diff(self, note_id: str, a: int, b: int) -> list:
+        """Unified diff lines from revision ``a`` to revision ``b``."""
+        return list(difflib.unified_diff(
+            self.text(note_id, a).splitlines(keepends=True),
+            self.text(note_id, b).splitlines(keepends=True),
+            fromfile=f"r{a}", tofile=f"r{b}"))
+
+    def restore(self, note_id: str, number: int, ts: float):
+        """Make revision ``number`` the latest again; returns (text, Revision)."""
+        text = self.text(note_id, number)
+        return text, self.commit(note_id, text, ts)
+
+    def _head(self, note_id):
+        if note_id not in self._heads and self._revisions.get(note_id):
+            self._heads[note_id] = self._entries(note_id, len(self._revisions[note_id]))
+        return self._heads.get(note_id)
+
+    def _entries(self, note_id: str, number: int) -> list:
+        revs = self._revisions[note_id]
+        if not 1 <= number <= len(revs):
+            raise KeyError(f"{note_id} has no revision {number}")
+        start = (number - 1) // KEYFRAME_EVERY * KEYFRAME_EVERY
+        entries = None
+        for rev in revs[start:number]:
+            manifest = json.loads(self.blobs.get(rev.manifest))
+            if "full" in manifest:
+                entries = manifest["full"]
+                continue
+            out = []
+            for op in manifest["delta"]:
+                if op[0] == "c":
+                    out.extend(entries[op[1]:op[1] + op[2]])
+                else:
+                    out.extend(op[1])
+            entries = out
+        return entries
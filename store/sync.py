@@ -0,0 +1,358 @@
+# =============================
+# store/sync.py
+# =============================
+"""Delta sync of a NoteTree against a sync service (see store/sync_server.py).
+
+Each node carries a version ``(lamport, device_id)``; the larger version
+wins on both ends, so every replica resolves conflicts the same way. Only
+nodes changed since the last exchange are sent, and the server answers with
+what changed since our cursor, so a sync with no changes costs a few bytes
+regardless of tree size.
+
+The notes a tracker starts with (the archive the app loaded) are a
+baseline, not local changes: they have no version, so anything the server
+holds beats them. The first exchange only pulls; baseline nodes the server
+has never heard of are uploaded after it.
+"""
+import json
+import zlib
+from collections import namedtuple
+
+from store.nodes import KIND_CODES, Node
+
+CONTENT_TYPE = "application/x-rc-sync+zlib"
+SYNC_PATH = "/sync"
+
+SyncResult = namedtuple("SyncResult", "sent received applied bytes_out bytes_in")
+
+# node attributes copied between tree nodes and sync records; "type" is
+# sent as its name and "created" as epoch seconds
+_NODE_FIELDS = ("name", "type", "created", "content")
+
+
+BASELINE = (0, "")      # version of a node nobody changed since the tracker started
+
+
+def version_key(record) -> tuple:
+    return (record["v"], record["dev"])
+
+
+def encode(payload: dict) -> bytes:
+    return zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+
+
+def decode(body: bytes) -> dict:
+    return json.loads(zlib.decompress(body).decode("utf-8"))
+
+
+def check_reply(reply) -> dict:
+    """``reply`` if it is a well-formed server answer, else ValueError."""
+    try:
+        ok = isinstance(reply["cursor"], int) and all(
+            isinstance(r["id"], str) and isinstance(r["v"], int) and "dev" in r
+            and (r.get("del") or r.get("type") in KIND_CODES
+                 and all(k in r for k in ("parent", "name", "created")))
+            for r in reply["changes"])
+    except (KeyError, TypeError):
+        ok = False
+    if not ok:
+        raise ValueError("malformed sync reply")
+    return reply
+
+
+class SyncTracker:
+    """Follows a NoteTree and keeps per-node versions and the dirty set.
+
+    Nodes already in the tree are the baseline: unversioned and clean.
+    Nothing is sent until the first exchange has pulled the server's state
+    (``pulled``); after that only changed ids are visited.
+    """
+
+    def __init__(self, tree, device_id: str):
+        self.tree = tree
+        self.device_id = device_id
+        self.lamport = 0
+        self.versions = {}      # id -> (lamport, device_id); baseline ids have none
+        self.dirty = set()
+        self.cursor = 0         # server change sequence seen so far
+        self.pulled = False     # the server's state has been applied once
+        self._applying = False
+        # unversioned baseline ids, until the first pull says which are new
+        self._baseline = set(tree.subtree_ids(tree.root.id)) - {tree.root.id}
+        tree.listeners.append(self._on_changes)
+
+    def _stamp(self, item_id):
+        self.lamport += 1
+        self.versions[item_id] = (self.lamport, self.device_id)
+        self.dirty.add(item_id)
+        self._baseline.discard(item_id)
+
+    def _on_changes(self, changes):
+        if self._applying:
+            return
+        for ch in changes:
+            if ch["op"] == "create":
+                for sid in self.tree.subtree_ids(ch["id"]):
+                    self._stamp(sid)
+            elif ch["op"] == "delete":
+                for sid in ch["removed"]:
+                    self._stamp(sid)
+            else:  # rename / move / edit
+                self._stamp(ch["id"])
+
+    # ---------- Outgoing ----------
+    def collect(self) -> list:
+        """Records for everything changed since the last collect().
+
+        Empty until the first pull, so local changes are sent with a
+        lamport clock that has caught up with the server.
+        """
+        if not self.pulled:
+            return []
+        out = [self._record(i) for i in self.dirty]
+        self.dirty.clear()
+        return out
+
+    def restore(self, records):
+        """Put records back in the dirty set after a failed exchange."""
+        self.dirty.update(r["id"] for r in records)
+
+    def _record(self, item_id) -> dict:
+        v, dev = self.versions[item_id]
+        rec = {"id": item_id, "v": v, "dev": dev}
+        node = self.tree.get(item_id)
+        if node is None:
+            rec["del"] = True
+            return rec
+        rec["parent"] = self.tree.parent_id(item_id)
+        for f in _NODE_FIELDS:
+            value = getattr(node, f)
+            if value is not None:
+                rec[f] = value
+        return rec
+
+    # ---------- Incoming ----------
+    def finish_pull(self, known):
+        """After the first pull: stamp baseline nodes missing from ``known``
+        (the ids the server sent), so the next exchange uploads them."""
+        for item_id in self._baseline - set(known):
+            if item_id in self.tree:
+                self._stamp(item_id)
+        self._baseline.clear()
+        self.pulled = True
+
+    def apply(self, records) -> list:
+        """Apply remote records that beat our versions, in one transaction.
+
+        Conflicts the versions alone don't settle are resolved by rules every
+        replica follows the same way, and the outcome is re-stamped so the
+        other replicas adopt it: a move that would put a folder inside itself
+        sends the lowest-versioned folder of the loop to the root; a remote
+        delete keeps the subtrees inside it that are newer, at the root, and
+        deletes the rest explicitly; a node newer than its remote delete is
+        re-sent with its subtree.
+        """
+        tree = self.tree
+        winners, self._rescued, self._dropped = [], [], []
+        for r in records:
+            self.lamport = max(self.lamport, r["v"])
+            if version_key(r) > self.versions.get(r["id"], BASELINE):
+                winners.append(r)
+            elif r.get("del") and r["id"] in tree:
+                # our newer version survives a delete that replicas which saw
+                # the delete first have applied to the whole subtree: resend it
+                self._rescued += tree.subtree_ids(r["id"])
+        applied = []
+        self._applying = True
+        try:
+            with tree.transaction():
+                pending = winners
+                while pending:  # parents may arrive after their children
+                    deferred = []
+                    for r in pending:
+                        if self._apply_one(r):
+                            self._won(r)
+                            applied.append(r["id"])
+                        else:
+                            deferred.append(r)
+                    if len(deferred) == len(pending):
+                        applied += self._settle_orphans(deferred)
+                        break
+                    pending = deferred
+        finally:
+            self._applying = False
+        for item_id in self._rescued:
+            if item_id in tree:
+                self._stamp(item_id)
+        for item_id in self._dropped:
+            if item_id not in tree:
+                self._stamp(item_id)
+        return applied
+
+    def _won(self, r):
+        self.versions[r["id"]] = version_key(r)
+        self.dirty.discard(r["id"])
+
+    def _apply_one(self, r) -> bool:
+        tree = self.tree
+        node = tree.get(r["id"])
+        if r.get("del"):
+            if node is not None:
+                self._delete(r["id"], version_key(r))
+            return True
+        if r["parent"] not in tree:
+            return False
+        if node is None:
+            node = Node(r["id"], r["name"], KIND_CODES[r["type"]], r["created"],
+                        content=r.get("content"))
+            tree.insert(node, r["parent"])
+            return True
+        if node.name != r["name"]:
+            tree.rename(r["id"], r["name"])
+        if "content" in r:
+            tree.set_content(r["id"], r["content"])
+        if tree.parent_id(r["id"]) != r["parent"] and not tree.move([r["id"]], r["parent"]):
+            self._break_cycle(r)
+        return True
+
+    def _version(self, item_id, r) -> tuple:
+        return version_key(r) if item_id == r["id"] else self.versions.get(item_id, BASELINE)
+
+    def _break_cycle(self, r):
+        """``r`` moves a folder into its own subtree (another replica moved
+        the other way): the loop's lowest-versioned folder goes to the root."""
+        tree = self.tree
+        ring = [r["id"]]
+        p = r["parent"]
+        while p != r["id"]:
+            ring.append(p)
+            p = tree.parent_id(p)
+        loser = min(ring, key=lambda i: self._version(i, r))
+        if loser != r["id"]:
+            tree.move([loser], tree.root.id)
+            tree.move([r["id"]], r["parent"])
+        elif tree.parent_id(loser) != tree.root.id:
+            tree.move([loser], tree.root.id)
+        self._rescued.append(loser)
+
+    def _delete(self, item_id, limit: tuple):
+        """Delete ``item_id`` but keep, at the root, each subtree inside it
+        whose top is newer than ``limit``. A kept subtree is re-sent whole:
+        replicas that applied the delete first have dropped all of it."""
+        tree = self.tree
+        kept, tops = set(), []
+        for i in tree.subtree_ids(item_id)[1:]:     # parents before children
+            if tree.parent_id(i) in kept:
+                kept.add(i)
+            elif self.versions.get(i, BASELINE) > limit:
+                kept.add(i)
+                tops.append(i)
+        if tops:
+            tree.move(tops, tree.root.id)
+            self._rescued += [i for t in tops for i in tree.subtree_ids(t)]
+        # the rest goes with it; replicas that hold some of it elsewhere by now
+        # only learn that from our own deletes
+        self._dropped += tree.delete([item_id])[1:]
+
+    def _settle_orphans(self, orphans) -> list:
+        """Records whose parent is gone: deleted here, or dropped below.
+
+        A record newer than the deletion that removed its parent is kept at
+        the root; an older one lost to it and its node is deleted too.
+        """
+        tree = self.tree
+        by_id = {r["id"]: r for r in orphans}
+
+        def depth(r):
+            d, seen = 0, {r["id"]}
+            while r["parent"] in by_id and r["parent"] not in seen:
+                r = by_id[r["parent"]]
+                seen.add(r["id"])
+                d += 1
+            return d
+
+        limits = {}     # dropped id -> the deletion its contents are held against
+        applied = []
+        for r in sorted(orphans, key=depth):    # parents first
+            pid = r["parent"]
+            if pid not in tree:
+                limit = limits.get(pid) or self.versions.get(pid, BASELINE)
+                if version_key(r) > limit:
+                    self._apply_one(dict(r, parent=tree.root.id))
+                    self._rescued += tree.subtree_ids(r["id"])
+                else:
+                    if r["id"] in tree:
+                        self._delete(r["id"], limit)
+                    self._dropped.append(r["id"])
+                    limits[r["id"]] = limit
+            elif not self._apply_one(r):
+                continue
+            self._won(r)
+            applied.append(r["id"])
+        return applied
+
+
+class SyncClient:
+    """Exchanges tracker deltas with the sync service over HTTP.
+
+    ``prepare`` and ``finish`` touch the tree and belong on the UI thread;
+    ``exchange`` does the encoding, network I/O and decoding and can run
+    on a worker thread. ``session`` is anything with a requests-style
+    ``post`` (a ``requests.Session`` by default).
+    """
+
+    def __init__(self, tracker: SyncTracker, base_url: str, session=None, timeout=10.0):
+        if session is None:
+            import requests
+            session = requests.Session()
+        self.tracker = tracker
+        self.url = base_url.rstrip("/") + SYNC_PATH
+        self.session = session
+        self.timeout = timeout
+        self._in_flight = None
+
+    def prepare(self) -> dict:
+        records = self.tracker.collect()
+        self._in_flight = records
+        return {"device": self.tracker.device_id,
+                "since": self.tracker.cursor,
+                "changes": records}
+
+    def exchange(self, request: dict) -> tuple:
+        """(reply, bytes out, bytes in); raises on network errors and on a
+        reply that does not decode or is malformed."""
+        body = encode(request)
+        resp = self.session.post(self.url, data=body, timeout=self.timeout,
+                                 headers={"Content-Type": CONTENT_TYPE})
+        resp.raise_for_status()
+        try:
+            reply = decode(resp.content)
+        except zlib.error as exc:
+            raise ValueError(f"undecodable sync reply ({exc})")
+        return check_reply(reply), len(body), len(resp.content)
+
+    def finish(self, reply: dict, bytes_out: int = 0, bytes_in: int = 0) -> SyncResult:
+        tracker = self.tracker
+        sent, self._in_flight = self._in_flight or [], None
+        applied = tracker.apply(reply["changes"])
+        tracker.cursor = reply["cursor"]
+        if not tracker.pulled:
+            tracker.finish_pull(r["id"] for r in reply["changes"])
+        return SyncResult(len(sent), len(reply["changes"]), len(applied),
+                          bytes_out, bytes_in)
+
+    def fail(self):
+        """Exchange failed: keep the unsent changes for the next attempt."""
+        if self._in_flight:
+            self.tracker.restore(self._in_flight)
+        self._in_flight = None
+
+    def sync(self) -> SyncResult:
+        """prepare + exchange + finish on the calling thread."""
+        request = self.prepare()
+        try:
+            reply = self.exchange(request)
+        except Exception:
+            self.fail()
+            raise
+        return self.finish(*reply)
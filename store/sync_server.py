@@ -0,0 +1,115 @@
+# =============================
+# store/sync_server.py
+# =============================
+"""Minimal sync service: the local stand-in used for development and tests.
+
+    server = SyncServer()
+    url = server.serve_in_thread()          # real HTTP on 127.0.0.1
+    client = SyncClient(tracker, url)
+    # or, without sockets:
+    client = SyncClient(tracker, "local://", session=InProcessSession(server))
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from store.sync import CONTENT_TYPE, SYNC_PATH, decode, encode, version_key
+
+
+class SyncServer:
+    """Keeps the winning record per id and an append-only change log.
+
+    Log entry ``i`` has sequence ``i + 1``, so "changes since cursor c" is
+    the slice ``log[c:]``: cost follows the number of changes, not the
+    number of records.
+    """
+
+    def __init__(self):
+        self.records = {}
+        self.changed_at = {}  # id -> seq of its current record
+        self.log = []         # ids, in sequence order
+        self._lock = threading.Lock()
+
+    @property
+    def cursor(self) -> int:
+        return len(self.log)
+
+    def handle(self, request: dict) -> dict:
+        since = request.get("since", 0)
+        with self._lock:
+            losers, taken = [], set()
+            for rec in request.get("changes", ()):
+                cur = self.records.get(rec["id"])
+                if cur is None or version_key(rec) > version_key(cur):
+                    self.records[rec["id"]] = rec
+                    self.log.append(rec["id"])
+                    self.changed_at[rec["id"]] = len(self.log)
+                    taken.add(rec["id"])
+                elif version_key(rec) < version_key(cur):
+                    losers.append(rec["id"])
+
+            # the sender's earlier records do go back: after a restart the
+            # server is the only place that still has them
+            out = {}
+            for seq, item_id in enumerate(self.log[since:], start=since + 1):
+                if self.changed_at[item_id] != seq:
+                    continue  # superseded later in the log
+                if item_id not in taken:
+                    out[item_id] = self.records[item_id]
+            for item_id in losers:  # the sender must adopt the newer version
+                out[item_id] = self.records[item_id]
+            return {"cursor": self.cursor, "changes": list(out.values())}
+
+    def handle_body(self, body: bytes) -> bytes:
+        return encode(self.handle(decode(body)))
+
+    def serve_in_thread(self, host="127.0.0.1", port=0) -> str:
+        """Start an HTTP server on a daemon thread; returns its base URL."""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != SYNC_PATH:
+                    self.send_error(404)
+                    return
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                try:
+                    reply = server.handle_body(body)
+                except (ValueError, KeyError):
+                    self.send_error(400)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(reply)))
+                self.end_headers()
+                self.wfile.write(reply)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return f"http://{host}:{self.httpd.server_port}"
+
+    def shutdown(self):
+        if getattr(self, "httpd", None):
+            self.httpd.shutdown()
+            self.httpd.server_close()
+
+
+class InProcessResponse:
+    def __init__(self, content: bytes):
+        self.status_code = 200
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+class InProcessSession:
+    """requests-style session that calls a SyncServer directly."""
+
+    def __init__(self, server: SyncServer):
+        self.server = server
+
+    def post(self, url, data=None, timeout=None, headers=None):
+        return InProcessResponse(self.server.handle_body(data))
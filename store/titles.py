@@ -0,0 +1,219 @@
+# =============================
+# store/titles.py
+# =============================
+"""Type-ahead search over every note and folder name.
+
+``TitleIndex`` keeps posting maps that follow the tree's change records:
+every trigram of each (lowercased) name, the 1- and 2-letter prefixes of
+its words, and its first 1-3 letters. A query term of three letters or
+more intersects its trigrams' postings, smallest first; a shorter term
+looks up its word prefix. Matches are ranked in tiers and, inside a tier,
+pulled out by name length bucket until the result is full, so a keystroke
+costs about the size of the answer, not of the tree.
+
+    python -m store.titles     # query times over 100,000 names
+"""
+import re
+
+SEARCH_LIMIT = 50
+_WORD = re.compile(r"\w+")
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _prefixes(text: str) -> set:
+    out = set()
+    for word in _WORD.findall(text):
+        out.add(word[:1])
+        out.add(word[:2])
+    return out
+
+
+class TitleIndex:
+    """Ranked name lookup for ``tree``; attach once, it follows every change.
+
+    Ranking: names starting with the query, then names with a word starting
+    with its first term, then any other match; shorter names first within
+    each tier, so an exact name comes top. Each tier is only computed if
+    the ones above it leave room in the result. Terms under three letters
+    only match word starts.
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        self._keys = {}     # id -> (length, lowercased name): the in-tier order
+        self._grams = {}    # trigram -> ids
+        self._heads = {}    # 1-/2-letter word prefix -> ids
+        self._starts = {}   # first 1-3 letters of the whole name -> ids
+        self._by_len = {}   # name length -> ids, to rank big candidate sets lazily
+        tree.listeners.append(self._on_changes)
+        for item_id in tree.subtree_ids(tree.root.id):
+            if item_id != tree.root.id:
+                self._add(item_id, tree.get(item_id).name)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    # ---------- Maintenance ----------
+    def _postings(self, low: str):
+        return ((self._grams, _trigrams(low)), (self._heads, _prefixes(low)),
+                (self._starts, {low[:n] for n in (1, 2, 3) if len(low) >= n}))
+
+    def _add(self, item_id: str, name: str):
+        low = name.lower()
+        self._keys[item_id] = (len(low), low)
+        self._by_len.setdefault(len(low), set()).add(item_id)
+        for postings, keys in self._postings(low):
+            for k in keys:
+                ids = postings.get(k)
+                if ids is None:
+                    postings[k] = {item_id}
+                else:
+                    ids.add(item_id)
+
+    def _remove(self, item_id: str):
+        key = self._keys.pop(item_id, None)
+        if key is None:
+            return
+        bucket = self._by_len[key[0]]
+        bucket.discard(item_id)
+        if not bucket:
+            del self._by_len[key[0]]
+        for postings, keys in self._postings(key[1]):
+            for k in keys:
+                ids = postings[k]
+                ids.discard(item_id)
+                if not ids:
+                    del postings[k]
+
+    def _on_changes(self, changes):
+        tree = self.tree
+        for ch in changes:
+            op = ch["op"]
+            if op == "create":
+                if ch["id"] not in tree:
+                    continue  # created and deleted in the same batch
+                for item_id in tree.subtree_ids(ch["id"]):
+                    if item_id not in self._keys:
+                        self._add(item_id, tree.get(item_id).name)
+            elif op == "rename":
+                self._remove(ch["id"])
+                if ch["id"] in tree:
+                    self._add(ch["id"], ch["new"])
+            elif op == "delete":
+                for item_id in ch["removed"]:
+                    self._remove(item_id)
+            # move / edit: the name is unchanged
+
+    # ---------- Queries ----------
+    def _candidates(self, term: str) -> set:
+        """Ids that may contain ``term`` (exact for terms of up to 3 letters)."""
+        if len(term) < 3:
+            return self._heads.get(term, set())
+        postings = []
+        for g in _trigrams(term):
+            ids = self._grams.get(g)
+            if not ids:
+                return set()
+            postings.append(ids)
+        postings.sort(key=len)
+        out = postings[0]
+        for ids in postings[1:]:
+            out = out & ids
+            if not out:
+                break
+        return out
+
+    def _shortest(self, ids: set, ok, want: int) -> list:
+        """Up to ``want`` of ``ids`` passing ``ok``, by (length, name).
+
+        Walks the length buckets upwards and stops once ``want`` are found,
+        so only the names that can make the cut are tested and sorted.
+        """
+        keys, out = self._keys, []
+        for length in sorted(self._by_len):
+            bucket = ids & self._by_len[length]
+            if bucket:
+                out += sorted((i for i in bucket if ok(keys[i][1])),
+                              key=keys.__getitem__)[:want - len(out)]
+                if len(out) >= want:
+                    break
+        return out
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> list:
+        """Ids of the best ``limit`` names containing every word of ``query``."""
+        terms = query.lower().split()
+        if not terms or limit <= 0:
+            return []
+        sets = sorted((self._candidates(t) for t in terms), key=len)
+        found = sets[0]
+        for s in sets[1:]:
+            found = found & s
+        if not found:
+            return []
+        whole = " ".join(terms)
+        word_start = re.compile(r"(?<!\w)" + re.escape(terms[0])).search
+        # trigram hits can straddle a gap ("abc" in "ab cd"): confirm the term
+        check = [t for t in terms if len(t) > 3]
+
+        def contains(low):
+            return all(t in low for t in check)
+
+        # three disjoint tiers; a lower one is only looked at if there is room
+        tiers = (
+            (lambda: found & self._starts.get(whole[:3], set()),
+             lambda low: low.startswith(whole) and contains(low)),
+            (lambda: found & self._heads.get(terms[0][:2], set()),
+             lambda low: not low.startswith(whole) and word_start(low) and contains(low)),
+            (lambda: found,
+             lambda low: not low.startswith(whole) and not word_start(low) and contains(low)),
+        )
+        out = []
+        for ids, ok in tiers:
+            out += self._shortest(ids(), ok, limit - len(out))
+            if len(out) >= limit:
+                break
+        return out
+
+
+# ---------- Benchmark ----------
+def _bench(count: int = 100_000):
+    import random
+    from time import perf_counter
+
+    from store.nodes import FOLDER, NOTE, Node
+    from store.tree import NoteTree
+
+    rng = random.Random(7)
+    words = ["planche", "front", "lever", "handstand", "push", "pull", "day", "week",
+             "ideas", "drills", "session", "mobility", "shopping", "list", "log",
+             "muscle", "up", "dips", "rings", "core", "legs", "notes", "plan"]
+    tree = NoteTree(Node("root", "", FOLDER, 0.0))
+    folders = ["root"]
+    with tree.transaction():
+        for i in range(count):
+            name = " ".join(rng.choice(words) for _ in range(rng.randint(1, 4)))
+            kind = FOLDER if rng.random() < 0.05 else NOTE
+            node = Node(f"x{i}", f"{name} {i}", kind, 0.0)
+            tree.insert(node, rng.choice(folders))
+            if kind == FOLDER:
+                folders.append(node.id)
+    t0 = perf_counter()
+    index = TitleIndex(tree)
+    print(f"{len(index)} names indexed in {(perf_counter() - t0) * 1000:.0f} ms")
+    for query in ("p", "pl", "pla", "plan", "planche", "front lev", "han day", "ring 4",
+                  "ses 99", "zzz"):
+        t0 = perf_counter()
+        hits = index.search(query)
+        ms = (perf_counter() - t0) * 1000
+        print(f"  {query!r:12} {len(hits):3} hits  {ms:6.2f} ms"
+              f"  {tree.get(hits[0]).name if hits else ''}")
+    t0 = perf_counter()
+    tree.rename("x1", "renamed planche note")
+    print(f"  rename      {(perf_counter() - t0) * 1000:6.3f} ms")
+
+
+if __name__ == "__main__":
+    _bench()
@@ -0,0 +1,265 @@
+# =============================
+# store/tree.py
+# =============================
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+from store.nodes import FOLDER, KIND_CODES, Node
+
+
+def new_id(kind: str) -> str:
+    # 64 random bits: ids are sync keys shared across devices, so a clash
+    # must stay unlikely at millions of nodes. Not uuid4, whose import alone
+    # slows store.cli startup.
+    return f"{'f' if kind == 'folder' else 'n'}{os.urandom(8).hex()}"
+
+
+class NoteTree:
+    """Id-indexed note tree with batched mutations.
+
+    Nodes are ``store.nodes.Node`` objects; the tree adds an id -> node
+    index and an id -> parent id map, so lookups and subtree operations
+    never walk from the root. It also stamps ``modified`` (epoch seconds,
+    like ``created``) when a node is created, renamed or edited. Every
+    mutation runs inside a transaction and listeners get one
+    ``listener(changes)`` call per outermost transaction, however many nodes
+    it touched.
+    """
+
+    def __init__(self, root: Node):
+        self.root = root
+        self.listeners = []
+        self._nodes = {}
+        self._parent = {}
+        self._changes = None  # list while a transaction is open
+        self._depth = 0
+        self._index_subtree(root, None)
+
+    # ---------- Lookup ----------
+    def __contains__(self, item_id) -> bool:
+        return item_id in self._nodes
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def get(self, item_id):
+        return self._nodes.get(item_id)
+
+    def note(self, item_id):
+        """The note ``item_id``, or None if it is missing or a folder."""
+        node = self._nodes.get(item_id)
+        return None if node is None or node.kind == FOLDER else node
+
+    def parent_id(self, item_id):
+        return self._parent.get(item_id)
+
+    def path(self, item_id) -> list:
+        """Folder ids from just below the root down to ``item_id``."""
+        out = []
+        while item_id is not None and item_id != self.root.id:
+            out.append(item_id)
+            item_id = self._parent.get(item_id)
+        out.reverse()
+        return out
+
+    def is_within(self, item_id, ancestor_id) -> bool:
+        """True if ``item_id`` is ``ancestor_id`` or lies below it. O(depth)."""
+        while item_id is not None:
+            if item_id == ancestor_id:
+                return True
+            item_id = self._parent.get(item_id)
+        return False
+
+    def subtree_ids(self, item_id) -> list:
+        out = []
+        stack = [self._nodes[item_id]]
+        while stack:
+            node = stack.pop()
+            out.append(node.id)
+            stack.extend(node.children or ())
+        return out
+
+    def folders(self):
+        """(id, node) for every folder, root included."""
+        return [(i, n) for i, n in self._nodes.items() if n.kind == FOLDER]
+
+    # ---------- Transactions ----------
+    @contextmanager
+    def transaction(self):
+        """Group mutations; listeners are notified once, on the outermost exit."""
+        if self._depth == 0:
+            self._changes = []
+        self._depth += 1
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                changes, self._changes = self._changes, None
+                if changes:
+                    for listener in list(self.listeners):
+                        listener(changes)
+
+    def _record(self, op: str, item_id: str, **fields):
+        fields["op"] = op
+        fields["id"] = item_id
+        self._changes.append(fields)
+
+    # ---------- Mutations ----------
+    def create(self, parent_id: str, kind: str, name: str, now=None) -> Node:
+        node = Node(self._free_id(kind), name, KIND_CODES[kind], now or time.time())
+        with self.transaction():
+            self._attach(node, parent_id)
+            self._record("create", node.id, parent=parent_id)
+        return node
+
+    def insert(self, node: Node, parent_id: str):
+        """Attach an already-built node (keeping its id), e.g. from sync."""
+        if node.id in self._nodes:
+            raise ValueError(f"Duplicate id: {node.id}")
+        with self.transaction():
+            self._attach(node, parent_id)
+            self._record("create", node.id, parent=parent_id)
+
+    def set_content(self, item_id: str, text: str, edit=None):
+        """Replace a note body. ``edit`` is the ``(pos, deleted, inserted)``
+        range that changed, if known, so listeners can update incrementally."""
+        node = self._nodes[item_id]
+        if node.content == text:
+            return
+        with self.transaction():
+            node.content = text
+            node.modified = time.time()
+            self._record("edit", item_id, edit=edit)
+
+    def rename(self, item_id: str, name: str):
+        node = self._nodes[item_id]
+        if node.name == name:
+            return
+        with self.transaction():
+            self._record("rename", item_id, old=node.name, new=name)
+            node.name = sys.intern(name)
+            node.modified = time.time()
+
+    def move(self, ids, dest_id: str) -> list:
+        """Move ``ids`` (with their subtrees) into folder ``dest_id``.
+
+        Items that are already there, or that would end up inside
+        themselves, are skipped. Returns the ids actually moved.
+        """
+        dest = self._nodes[dest_id]
+        if dest.kind != FOLDER:
+            raise ValueError(f"Not a folder: {dest_id}")
+        moving = [i for i in self._top_level(ids)
+                  if self._parent.get(i) != dest_id and not self.is_within(dest_id, i)]
+        if not moving:
+            return []
+        with self.transaction():
+            old_parents = {i: self._parent[i] for i in moving}
+            self._detach(moving)
+            for i in moving:
+                self._attach(self._nodes[i], dest_id, index=False)
+                self._record("move", i, old=old_parents[i], new=dest_id)
+        return moving
+
+    def delete(self, ids) -> list:
+        """Delete ``ids`` and everything below them; returns all removed ids."""
+        top = [i for i in self._top_level(ids) if i != self.root.id]
+        if not top:
+            return []
+        removed = []
+        with self.transaction():
+            parents = {i: self._parent[i] for i in top}
+            self._detach(top)
+            for i in top:
+                node = self._nodes[i]
+                sub = self.subtree_ids(i)
+                for sid in sub:
+                    del self._nodes[sid]
+                    self._parent.pop(sid, None)
+                removed.extend(sub)
+                # node: the detached subtree, for listeners that keep totals
+                self._record("delete", i, parent=parents[i], removed=sub, node=node)
+        return removed
+
+    def duplicate(self, ids, now=None) -> list:
+        """Copy ``ids`` (deeply, with fresh ids) next to the originals."""
+        now = now or time.time()
+        copies = []
+        with self.transaction():
+            for i in self._top_level(ids):
+                if i == self.root.id:
+                    continue
+                copy = self._copy_subtree(self._nodes[i], now)
+                copy.name = f"{copy.name} copy"
+                parent_id = self._parent[i]
+                self._attach(copy, parent_id)
+                self._record("create", copy.id, parent=parent_id, source=i)
+                copies.append(copy)
+        return copies
+
+    # ---------- Internals ----------
+    def _index_subtree(self, node: Node, parent_id):
+        stack = [(node, parent_id)]
+        while stack:
+            n, pid = stack.pop()
+            self._nodes[n.id] = n
+            if pid is not None:
+                self._parent[n.id] = pid
+            stack.extend((ch, n.id) for ch in n.children or ())
+
+    def _attach(self, node: Node, parent_id: str, index=True):
+        self._nodes[parent_id].children.append(node)
+        self._parent[node.id] = parent_id
+        if index:
+            self._index_subtree(node, parent_id)
+
+    def _detach(self, ids):
+        """Unlink ``ids`` from their parents; one pass per affected folder."""
+        by_parent = {}
+        for i in ids:
+            by_parent.setdefault(self._parent[i], set()).add(i)
+        for pid, gone in by_parent.items():
+            parent = self._nodes[pid]
+            parent.children = [ch for ch in parent.children if ch.id not in gone]
+
+    def _top_level(self, ids) -> list:
+        """Known ids whose ancestors are not also in ``ids`` (dedup multi-select)."""
+        wanted = [i for i in dict.fromkeys(ids) if i in self._nodes]
+        chosen = set(wanted)
+        out = []
+        for i in wanted:
+            p = self._parent.get(i)
+            while p is not None and p not in chosen:
+                p = self._parent.get(p)
+            if p is None:
+                out.append(i)
+        return out
+
+    def _free_id(self, kind: str, taken=()) -> str:
+        """A fresh id that is neither in the tree nor in ``taken``."""
+        while True:
+            item_id = new_id(kind)
+            if item_id not in self._nodes and item_id not in taken:
+                return item_id
+
+    def _copy_subtree(self, node: Node, now: float) -> Node:
+        taken = set()   # ids of this copy, not indexed until it is attached
+
+        def clone(n):
+            item_id = self._free_id(n.type, taken)
+            taken.add(item_id)
+            # derived fields are recomputed by the listeners on "create"
+            return Node(item_id, n.name, n.kind, now, content=n.content)
+
+        top = clone(node)
+        stack = [(node, top)]
+        while stack:
+            src, dst = stack.pop()
+            for ch in src.children or ():
+                c = clone(ch)
+                dst.children.append(c)
+                stack.append((ch, c))
+        return top
@@ -0,0 +1,170 @@
+# =============================
+# store/undo.py
+# =============================
+from collections import deque
+
+# Per-unit bookkeeping on top of the changed characters themselves
+UNIT_OVERHEAD = 64
+# Keystrokes further apart than this start a new undo unit
+GROUP_GAP_S = 1.0
+
+
+def diff(old: str, new: str):
+    """Smallest single-range edit turning ``old`` into ``new``.
+
+    Returns ``(pos, deleted, inserted)``. Typing, backspace, paste and
+    replacing a selection are all one contiguous range.
+    """
+    n = min(len(old), len(new))
+    pre = 0
+    step = 256
+    while pre < n:  # compare in chunks, then narrow down character by character
+        end = min(pre + step, n)
+        if old[pre:end] == new[pre:end]:
+            pre = end
+            continue
+        while old[pre] == new[pre]:
+            pre += 1
+        break
+    suf = 0
+    limit = n - pre
+    while suf < limit and old[len(old) - 1 - suf] == new[len(new) - 1 - suf]:
+        suf += 1
+    return pre, old[pre:len(old) - suf], new[pre:len(new) - suf]
+
+
+class UndoUnit:
+    """One undoable step: text ``deleted`` at ``pos`` was replaced by ``inserted``."""
+    __slots__ = ("pos", "deleted", "inserted", "seq", "last_ts")
+
+    def __init__(self, pos, deleted, inserted, seq, ts):
+        self.pos = pos
+        self.deleted = deleted
+        self.inserted = inserted
+        self.seq = seq
+        self.last_ts = ts
+
+    @property
+    def size(self) -> int:
+        return UNIT_OVERHEAD + len(self.deleted) + len(self.inserted)
+
+    def absorb(self, pos, deleted, inserted, ts) -> bool:
+        """Merge a follow-up keystroke into this unit if it continues it."""
+        if ts - self.last_ts > GROUP_GAP_S or "\n" in inserted or self.inserted.endswith("\n"):
+            return False
+        if not deleted and not self.deleted and pos == self.pos + len(self.inserted):
+            # typing on: break the unit at a word boundary
+            if inserted.isspace() != self.inserted[-1:].isspace() and inserted.isspace():
+                return False
+            self.inserted += inserted
+        elif not inserted and not self.inserted and pos + len(deleted) == self.pos:
+            self.deleted = deleted + self.deleted  # backspace
+            self.pos = pos
+        elif not inserted and not self.inserted and pos == self.pos:
+            self.deleted += deleted  # forward delete
+        else:
+            return False
+        self.last_ts = ts
+        return True
+
+
+class NoteHistory:
+    __slots__ = ("undo", "redo")
+
+    def __init__(self):
+        self.undo = deque()
+        self.redo = []
+
+
+class UndoManager:
+    """Per-note undo/redo with a single memory budget shared by all notes.
+
+    Units store only the changed characters, so memory follows the size of
+    the edits rather than note size x edit count. When the budget is
+    exceeded the oldest units across all notes are dropped first.
+    """
+
+    def __init__(self, budget_bytes=512 * 1024):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self._histories = {}
+        self._seq = 0  # creation order of units, across notes
+
+    def _history(self, note_id) -> NoteHistory:
+        h = self._histories.get(note_id)
+        if h is None:
+            h = self._histories[note_id] = NoteHistory()
+        return h
+
+    def can_undo(self, note_id) -> bool:
+        h = self._histories.get(note_id)
+        return bool(h and h.undo)
+
+    def can_redo(self, note_id) -> bool:
+        h = self._histories.get(note_id)
+        return bool(h and h.redo)
+
+    def record(self, note_id, old: str, new: str, ts: float):
+        if old != new:
+            self.record_edit(note_id, *diff(old, new), ts)
+
+    def record_edit(self, note_id, pos: int, deleted: str, inserted: str, ts: float):
+        """Like record(), with the diff already computed by the caller."""
+        h = self._history(note_id)
+        for unit in h.redo:
+            self.used_bytes -= unit.size
+        h.redo.clear()
+
+        last = h.undo[-1] if h.undo else None
+        if last is not None:
+            before = last.size
+            if last.absorb(pos, deleted, inserted, ts):
+                self.used_bytes += last.size - before
+                self._evict()
+                return
+        self._seq += 1
+        unit = UndoUnit(pos, deleted, inserted, self._seq, ts)
+        h.undo.append(unit)
+        self.used_bytes += unit.size
+        self._evict()
+
+    def undo(self, note_id, text: str):
+        """Return ``(text, cursor)`` with the last unit reverted, or None."""
+        h = self._histories.get(note_id)
+        if not h or not h.undo:
+            return None
+        unit = h.undo.pop()
+        unit.last_ts = float("-inf")  # never merge into a redone unit
+        h.redo.append(unit)
+        end = unit.pos + len(unit.inserted)
+        return text[:unit.pos] + unit.deleted + text[end:], unit.pos + len(unit.deleted)
+
+    def redo(self, note_id, text: str):
+        h = self._histories.get(note_id)
+        if not h or not h.redo:
+            return None
+        unit = h.redo.pop()
+        h.undo.append(unit)
+        end = unit.pos + len(unit.deleted)
+        return text[:unit.pos] + unit.inserted + text[end:], unit.pos + len(unit.inserted)
+
+    def forget(self, note_id):
+        """Drop a note's history (e.g. after the note was deleted)."""
+        h = self._histories.pop(note_id, None)
+        if h:
+            self.used_bytes -= sum(u.size for u in h.undo) + sum(u.size for u in h.redo)
+
+    def _evict(self):
+        while self.used_bytes > self.budget_bytes:
+            # oldest unit overall = smallest seq among the notes' oldest units
+            fronts = [h for h in self._histories.values() if h.undo]
+            if not fronts:
+                break
+            h = min(fronts, key=lambda h: h.undo[0].seq)
+            self.used_bytes -= h.undo.popleft().size
+        if self.used_bytes > self.budget_bytes:
+            # only redo entries are left to give up
+            for h in self._histories.values():
+                for unit in h.redo:
+                    self.used_bytes -= unit.size
+                h.redo.clear()
@@ -0,0 +1,105 @@
+# =============================
+# timing/clock.py
+# =============================
+import random
+from time import perf_counter
+
+
+class KivyClock:
+    """Real time source backed by perf_counter and the Kivy Clock."""
+
+    def __init__(self):
+        from kivy.clock import Clock  # imported here so headless runs never load Kivy
+        self._clock = Clock
+
+    def now(self) -> float:
+        return perf_counter()
+
+    def schedule_once(self, callback, timeout=0):
+        return self._clock.schedule_once(callback, timeout)
+
+    def schedule_interval(self, callback, interval):
+        return self._clock.schedule_interval(callback, interval)
+
+
+class VirtualEvent:
+    __slots__ = ("callback", "timeout", "repeat", "last", "cancelled")
+
+    def __init__(self, callback, timeout, repeat, now):
+        self.callback = callback
+        self.timeout = timeout
+        self.repeat = repeat
+        self.last = now
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class VirtualClock:
+    """Deterministic stand-in for KivyClock; time only moves in step().
+
+    Each step is one frame of ``frame_dt`` seconds plus up to ``jitter``
+    seconds of random lateness. Like Kivy, due events run once per frame,
+    receive the time since they were (re)armed, and an interval callback
+    returning False unschedules itself. Events created during a frame wait
+    for the next one.
+    """
+
+    def __init__(self, frame_dt=1 / 60, jitter=0.0, seed=0, start=0.0):
+        self.frame_dt = frame_dt
+        self.jitter = jitter
+        self.frames = 0
+        self._now = start
+        self._rng = random.Random(seed)
+        self._events = []
+
+    def now(self) -> float:
+        return self._now
+
+    def schedule_once(self, callback, timeout=0):
+        ev = VirtualEvent(callback, timeout, False, self._now)
+        self._events.append(ev)
+        return ev
+
+    def schedule_interval(self, callback, interval):
+        ev = VirtualEvent(callback, interval, True, self._now)
+        self._events.append(ev)
+        return ev
+
+    def step(self):
+        dt = self.frame_dt
+        if self.jitter:
+            dt += self._rng.uniform(0.0, self.jitter)
+        self._now += dt
+        self.frames += 1
+
+        pending, self._events = self._events, []
+        keep = []
+        for ev in pending:
+            if ev.cancelled:
+                continue
+            elapsed = self._now - ev.last
+            if elapsed < ev.timeout:
+                keep.append(ev)
+                continue
+            ret = ev.callback(elapsed)
+            if ev.repeat and ret is not False and not ev.cancelled:
+                ev.last = self._now
+                keep.append(ev)
+        # keep arming order: survivors first, then events created this frame
+        self._events = keep + self._events
+
+    def advance(self, seconds: float):
+        end = self._now + seconds
+        while self._now < end:
+            self.step()
+
+    def run_until(self, predicate, limit: float) -> bool:
+        """Step until ``predicate()`` is true or ``limit`` seconds pass."""
+        end = self._now + limit
+        while not predicate():
+            if self._now >= end:
+                return False
+            self.step()
+        return True
@@ -0,0 +1,237 @@
+# =============================
+# timing/engines.py
+# =============================
+from debug.profiler import profiled
+
+
+class Countdown:
+    """Countdown state machine: 'setup' | 'running' | 'paused' | 'finished'.
+
+    ``clock`` is a KivyClock or VirtualClock; ``on_update(countdown)`` runs
+    after every change and tick, ``on_finish(countdown)`` once at zero.
+    """
+
+    def __init__(self, clock, on_update=None, on_finish=None):
+        self.clock = clock
+        self.on_update = on_update
+        self.on_finish = on_finish
+        self.state = "setup"
+        self.set_seconds = 0
+        self.remaining = 0.0
+        self._last_ts = None
+        self._event = None
+
+    @property
+    def running(self) -> bool:
+        return self.state == "running"
+
+    @property
+    def progress(self) -> float:
+        if self.set_seconds > 0:
+            return float(self.remaining) / float(self.set_seconds)
+        return 0.0
+
+    # ---------- Controls ----------
+    def start(self, total) -> bool:
+        if total <= 0:
+            return False
+        self.set_seconds = total
+        self.remaining = float(total)
+        self._run()
+        return True
+
+    def pause(self):
+        if self.state != "running":
+            return
+        self.state = "paused"
+        self._cancel()
+        self._notify()
+
+    def resume(self):
+        if self.state != "paused" or self.remaining <= 0:
+            return
+        self._run()
+
+    def snooze(self, seconds=30):
+        """Restart from ``seconds`` (used after the countdown finished)."""
+        self.set_seconds = seconds
+        self.remaining = float(seconds)
+        self._run()
+
+    def stop(self):
+        self.state = "setup"
+        self._cancel()
+        self.set_seconds = 0
+        self.remaining = 0.0
+        self._notify()
+
+    # ---------- Internals ----------
+    def _run(self):
+        self.state = "running"
+        self._last_ts = self.clock.now()
+        self._cancel()
+        self._event = self.clock.schedule_interval(self._tick, 0)
+        self._notify()
+
+    def _cancel(self):
+        if self._event:
+            self._event.cancel()
+            self._event = None
+
+    def _notify(self):
+        if self.on_update:
+            self.on_update(self)
+
+    @profiled("Countdown._tick")
+    def _tick(self, dt):
+        if self.state != "running":
+            return False
+
+        now = self.clock.now()
+        if self._last_ts is None:
+            self._last_ts = now
+        elapsed = now - self._last_ts
+        self._last_ts = now
+
+        self.remaining = max(0.0, self.remaining - elapsed)
+        if self.remaining <= 0.0:
+            self.state = "finished"
+            self._cancel()
+            self._notify()
+            if self.on_finish:
+                self.on_finish(self)
+            return False
+        self._notify()
+
+
+class Stopwatch:
+    """Start/pause/reset stopwatch; ``on_update(stopwatch)`` runs every frame."""
+
+    def __init__(self, clock, on_update=None):
+        self.clock = clock
+        self.on_update = on_update
+        self.running = False
+        self._start = 0.0
+        self._accum = 0.0
+        self._event = None
+
+    def elapsed(self, now=None) -> float:
+        if not self.running:
+            return self._accum
+        if now is None:
+            now = self.clock.now()
+        return self._accum + (now - self._start)
+
+    def toggle(self):
+        if self.running:
+            self.pause()
+        else:
+            self.start()
+
+    def start(self):
+        if self.running:
+            return
+        self._start = self.clock.now()
+        self.running = True
+        self._cancel()
+        self._event = self.clock.schedule_interval(self._tick, 0)
+        self._notify()
+
+    def pause(self):
+        if not self.running:
+            return
+        self._accum += self.clock.now() - self._start
+        self.running = False
+        self._cancel()
+        self._notify()
+
+    def reset(self):
+        self.running = False
+        self._cancel()
+        self._accum = 0.0
+        self._notify()
+
+    def _cancel(self):
+        if self._event:
+            self._event.cancel()
+            self._event = None
+
+    def _notify(self):
+        if self.on_update:
+            self.on_update(self)
+
+    @profiled("Stopwatch._tick")
+    def _tick(self, dt):
+        self._notify()
+
+
+class Metronome:
+    """Beat scheduler; ``on_beat(index)`` runs on every beat.
+
+    Beats are scheduled against a fixed grid (start + n * interval) rather
+    than relative to when the previous tick actually ran, so frame lateness
+    does not accumulate into tempo drift.
+    """
+
+    def __init__(self, clock, on_beat=None, bpm=60):
+        self.clock = clock
+        self.on_beat = on_beat
+        self.bpm = bpm
+        self.running = False
+        self.beat_index = 0
+        self.last_beat_ts = None
+        self._beat_due = 0.0   # grid time of the last beat
+        self._next_due = 0.0
+        self._event = None
+
+    @property
+    def interval(self) -> float:
+        return max(60.0 / float(max(1, self.bpm)), 0.001)
+
+    def start(self):
+        self.running = True
+        self.beat_index = 0
+        self._next_due = self.clock.now()
+        self._tick(0)
+
+    def stop(self):
+        self.running = False
+        self._cancel()
+
+    def set_bpm(self, bpm):
+        """Change tempo; the next beat lands one new interval after the last."""
+        self.bpm = bpm
+        if not self.running:
+            return
+        if self.last_beat_ts is None:
+            self._next_due = self.clock.now() + self.interval
+        else:
+            self._next_due = self._beat_due + self.interval
+        self._arm()
+
+    def _cancel(self):
+        if self._event is not None:
+            self._event.cancel()
+            self._event = None
+
+    def _arm(self):
+        self._cancel()
+        delay = max(0.0, self._next_due - self.clock.now())
+        self._event = self.clock.schedule_once(self._tick, delay)
+
+    @profiled("Metronome._tick")
+    def _tick(self, dt):
+        if not self.running:
+            return
+        now = self.clock.now()
+        if self.on_beat:
+            self.on_beat(self.beat_index)
+        self.beat_index += 1
+        self.last_beat_ts = now
+        self._next_due += self.interval
+        if self._next_due <= now:
+            # stalled for more than a beat: drop the missed beats, keep the grid
+            missed = int((now - self._next_due) // self.interval) + 1
+            self._next_due += missed * self.interval
+        self._beat_due = self._next_due - self.interval
+        self._arm()
@@ -0,0 +1,187 @@
+# =============================
+# timing/group.py
+# =============================
+import heapq
+import math
+from itertools import count
+
+from debug.profiler import profiled
+
+
+class GroupItem:
+    """One countdown ("timer") or stopwatch in a TimerGroup.
+
+    Nothing here changes per frame: a running countdown is a deadline and a
+    running stopwatch a start time, so the shown value is derived on demand.
+    """
+    __slots__ = ("id", "label", "kind", "state", "set_seconds", "remaining",
+                 "deadline", "accum", "started", "shown", "gen")
+
+    def __init__(self, item_id: int, label: str, kind: str, seconds: int = 0):
+        self.id = item_id
+        self.label = label
+        self.kind = kind            # "timer" | "stopwatch"
+        self.state = "setup"        # 'setup' | 'running' | 'paused' | 'finished'
+        self.set_seconds = seconds
+        self.remaining = float(seconds)
+        self.deadline = 0.0         # countdown: clock time it reaches zero
+        self.accum = 0.0            # stopwatch: seconds before the current run
+        self.started = 0.0          # stopwatch: clock time of the current run
+        self.shown = 0              # whole seconds currently displayed
+        self.gen = 0                # bumps on every control; stale heap entries skip
+
+    @property
+    def running(self) -> bool:
+        return self.state == "running"
+
+    def value(self, now: float) -> float:
+        """Seconds left (timer) or elapsed (stopwatch) at ``now``."""
+        if self.kind == "timer":
+            return max(0.0, self.deadline - now) if self.running else self.remaining
+        return self.accum + (now - self.started if self.running else 0.0)
+
+
+class TimerGroup:
+    """Many independent timers and stopwatches on one deadline heap.
+
+    Each running item has exactly one heap entry: the moment its whole-second
+    display next changes (or a countdown hits zero). A single clock event is
+    armed for the earliest entry; when it fires, every due item is advanced
+    and ``on_change(ids)`` gets them all in one call, so the UI refreshes
+    once per pass. Cost follows due events, not the number of running items.
+    """
+
+    def __init__(self, clock, on_change=None, on_finish=None):
+        self.clock = clock
+        self.on_change = on_change      # on_change(set of item ids)
+        self.on_finish = on_finish      # on_finish(item), per countdown at zero
+        self.items = {}
+        self._ids = count(1)
+        self._seq = count()
+        self._heap = []                 # (due, seq, item id, gen)
+        self._event = None
+        self._armed_due = None
+
+    # ---------- Items ----------
+    def add_timer(self, label: str, seconds: int) -> GroupItem:
+        item = GroupItem(next(self._ids), label, "timer", seconds)
+        item.shown = seconds
+        self.items[item.id] = item
+        self._changed({item.id})
+        return item
+
+    def add_stopwatch(self, label: str) -> GroupItem:
+        item = GroupItem(next(self._ids), label, "stopwatch")
+        self.items[item.id] = item
+        self._changed({item.id})
+        return item
+
+    def remove(self, item_id: int):
+        item = self.items.pop(item_id, None)
+        if item is not None:
+            item.gen += 1
+            self._changed({item_id})
+
+    # ---------- Controls ----------
+    def start(self, item_id: int):
+        item = self.items[item_id]
+        if item.running:
+            return
+        now = self.clock.now()
+        if item.kind == "timer":
+            if item.state in ("setup", "finished"):
+                item.remaining = float(item.set_seconds)
+            if item.remaining <= 0:
+                return
+            item.deadline = now + item.remaining
+        else:
+            item.started = now
+        item.state = "running"
+        item.gen += 1
+        self._schedule(item, now)
+        self._changed({item_id})
+
+    def pause(self, item_id: int):
+        item = self.items[item_id]
+        if not item.running:
+            return
+        now = self.clock.now()
+        if item.kind == "timer":
+            item.remaining = max(0.0, item.deadline - now)
+        else:
+            item.accum += now - item.started
+        item.state = "paused"
+        item.gen += 1
+        self._changed({item_id})
+
+    def toggle(self, item_id: int):
+        if self.items[item_id].running:
+            self.pause(item_id)
+        else:
+            self.start(item_id)
+
+    def reset(self, item_id: int):
+        item = self.items[item_id]
+        item.state = "setup"
+        item.gen += 1
+        item.remaining = float(item.set_seconds)
+        item.accum = 0.0
+        item.shown = item.set_seconds if item.kind == "timer" else 0
+        self._changed({item_id})
+
+    def shown_seconds(self, item: GroupItem, now=None) -> int:
+        """Whole seconds to display: rounded up for timers, down for stopwatches."""
+        value = item.value(self.clock.now() if now is None else now)
+        if item.kind == "timer":
+            return math.ceil(value - 1e-9)
+        return int(value + 1e-9)
+
+    # ---------- Heap ----------
+    def _schedule(self, item: GroupItem, now: float):
+        """Push the moment ``item``'s display next changes."""
+        item.shown = self.shown_seconds(item, now)
+        if item.kind == "timer":
+            due = item.deadline - (item.shown - 1)
+        else:
+            due = item.started + (item.shown + 1 - item.accum)
+        heapq.heappush(self._heap, (due, next(self._seq), item.id, item.gen))
+        self._arm(now)
+
+    def _arm(self, now: float):
+        if not self._heap:
+            return
+        due = self._heap[0][0]
+        if self._armed_due is not None and self._armed_due <= due:
+            return
+        if self._event is not None:
+            self._event.cancel()
+        self._armed_due = due
+        self._event = self.clock.schedule_once(self._fire, max(0.0, due - now))
+
+    @profiled("TimerGroup._fire")
+    def _fire(self, dt):
+        self._event, self._armed_due = None, None
+        now = self.clock.now()
+        heap, due_ids, finished = self._heap, set(), []
+        while heap and heap[0][0] <= now + 1e-9:
+            _, _, item_id, gen = heapq.heappop(heap)
+            item = self.items.get(item_id)
+            if item is None or item.gen != gen:
+                continue  # paused, reset or removed since it was pushed
+            due_ids.add(item_id)
+            if item.kind == "timer" and item.deadline <= now + 1e-9:
+                item.state, item.remaining, item.shown = "finished", 0.0, 0
+                item.gen += 1
+                finished.append(item)
+            else:
+                self._schedule(item, now)
+        self._arm(now)
+        if due_ids:
+            self._changed(due_ids)
+        if self.on_finish:
+            for item in finished:
+                self.on_finish(item)
+
+    def _changed(self, ids):
+        if self.on_change:
+            self.on_change(ids)
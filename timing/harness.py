@@ -0,0 +1,126 @@
+# =============================
+# timing/harness.py
+# =============================
+"""Headless runs of the timing engines on a VirtualClock.
+
+    python -m timing.harness          # regression suite, exit 1 on failure
+"""
+import sys
+from time import perf_counter
+
+from timing.clock import VirtualClock
+from timing.engines import Countdown, Metronome, Stopwatch
+from timing.group import TimerGroup
+
+
+def run_countdown(seconds, frame_dt=1 / 60, jitter=0.0, seed=0):
+    clock = VirtualClock(frame_dt=frame_dt, jitter=jitter, seed=seed)
+    done = []
+    cd = Countdown(clock, on_finish=lambda c: done.append(clock.now()))
+    start = clock.now()
+    cd.start(seconds)
+    clock.run_until(lambda: done, limit=seconds + 1.0)
+    finished_at = done[0] - start if done else float("inf")
+    return {"frames": clock.frames, "error": finished_at - seconds}
+
+
+def run_stopwatch(seconds, lap=60.0, pause=5.0, frame_dt=1 / 60, jitter=0.0, seed=0):
+    """Run in ``lap``-second stretches separated by ``pause``-second pauses."""
+    clock = VirtualClock(frame_dt=frame_dt, jitter=jitter, seed=seed)
+    sw = Stopwatch(clock)
+    running = 0.0
+    while running < seconds:
+        start = clock.now()
+        sw.start()
+        clock.advance(min(lap, seconds - running))
+        sw.pause()
+        running += clock.now() - start
+        clock.advance(pause)
+    return {"frames": clock.frames, "error": sw.elapsed() - running}
+
+
+def run_metronome(bpm, beats, frame_dt=1 / 60, jitter=0.0, seed=0):
+    """Beat-timing error against the ideal grid (start + n * 60/bpm)."""
+    clock = VirtualClock(frame_dt=frame_dt, jitter=jitter, seed=seed)
+    times = []
+    met = Metronome(clock, on_beat=lambda i: times.append(clock.now()), bpm=bpm)
+    start = clock.now()
+    met.start()
+    clock.run_until(lambda: len(times) >= beats,
+                    limit=beats * met.interval + 1.0)
+    met.stop()
+    errors = [t - (start + i * met.interval) for i, t in enumerate(times)]
+    return {
+        "frames": clock.frames,
+        "beats": len(times),
+        "max_error": max(errors, key=abs),
+        "mean_error": sum(errors) / len(errors),
+        "drift": errors[-1],
+    }
+
+
+def run_group(timers, stopwatches, frame_dt=1 / 60, jitter=0.0, seed=0):
+    """Many timers (5..14 s) and stopwatches on one TimerGroup; worst finish
+    lateness, and how many refresh passes the UI would have done."""
+    clock = VirtualClock(frame_dt=frame_dt, jitter=jitter, seed=seed)
+    passes, late = [], []
+    group = TimerGroup(clock, on_change=passes.append,
+                       on_finish=lambda it: late.append(clock.now() - it.deadline))
+    items = [group.add_timer(f"t{i}", 5 + i % 10) for i in range(timers)]
+    items += [group.add_stopwatch(f"s{i}") for i in range(stopwatches)]
+    for item in items:
+        group.start(item.id)
+    passes.clear()
+    clock.run_until(lambda: len(late) == timers, limit=20.0)
+    return {"frames": clock.frames, "passes": len(passes),
+            "max_error": max(late) if len(late) == timers else float("inf")}
+
+
+def _one_frame(jitter=0.0):
+    """Events fire on the first frame at/after their deadline: one frame late at most."""
+    return 1 / 60 + jitter + 1e-6
+
+
+# name, runner, kwargs, metric, allowed |error| (s)
+SUITE = [
+    ("countdown 20 min", run_countdown,
+     {"seconds": 20 * 60}, "error", _one_frame()),
+    ("countdown 20 min, 8 ms jitter", run_countdown,
+     {"seconds": 20 * 60, "jitter": 0.008}, "error", _one_frame(0.008)),
+    ("stopwatch 1 h with pauses, 8 ms jitter", run_stopwatch,
+     {"seconds": 3600, "jitter": 0.008}, "error", 1e-6),
+    ("metronome 10k beats @ 120", run_metronome,
+     {"bpm": 120, "beats": 10_000}, "max_error", _one_frame()),
+    ("metronome 10k beats @ 173, 8 ms jitter", run_metronome,
+     {"bpm": 173, "beats": 10_000, "jitter": 0.008}, "max_error", _one_frame(0.008)),
+    ("group: 500 timers + 500 stopwatches, 8 ms jitter", run_group,
+     {"timers": 500, "stopwatches": 500, "jitter": 0.008}, "max_error", _one_frame(0.008)),
+]
+
+# Whole suite, wall clock; keeps the virtual clock honest about being fast
+WALL_BUDGET_S = 10.0
+
+
+def main(argv=None) -> int:
+    failed = 0
+    t0 = perf_counter()
+    for name, runner, kwargs, metric, allowed in SUITE:
+        started = perf_counter()
+        result = runner(**kwargs)
+        wall = perf_counter() - started
+        value = result[metric]
+        ok = abs(value) <= allowed
+        failed += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name:<50} {metric}={value * 1000:+8.3f} ms "
+              f"(<= {allowed * 1000:.3f})  {result['frames']:>7} frames  {wall:6.2f} s")
+    total = perf_counter() - t0
+    if total > WALL_BUDGET_S:
+        failed += 1
+        print(f"FAIL suite took {total:.2f} s (budget {WALL_BUDGET_S:.0f} s)")
+    else:
+        print(f"suite took {total:.2f} s of wall time")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
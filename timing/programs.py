@@ -0,0 +1,186 @@
+# =============================
+# timing/programs.py
+# =============================
+import re
+from collections import OrderedDict, namedtuple
+from hashlib import blake2b
+
+PARSE_CACHE_SIZE = 2048     # paragraphs; a long journal fits many times over
+REST_WORDS = ("rest", "break", "recover")
+
+# one timed interval; kind is "work" or "rest"
+Step = namedtuple("Step", "label seconds kind")
+
+
+class Program(namedtuple("Program", "title steps")):
+    __slots__ = ()
+
+    @property
+    def total_seconds(self) -> int:
+        return sum(s.seconds for s in self.steps)
+
+
+_PARAGRAPH = re.compile(r"\n[ \t]*\n")
+_REPS = re.compile(r"^\s*(?:[-*]\s+)?(\d+)\s*[x×]\s*", re.I)
+# m:ss, but not part of h:mm:ss, a decimal or a date, nor a time of day (8:30 am)
+_CLOCK = re.compile(r"(?<![\d:.\-/])(\d{1,3}):([0-5]\d)(?![\d:])(?!\s*[ap]\.?m\b)"
+                    r"(?:\s*(?:min(?:ute)?s?|m)(?![a-z])\.?)?", re.I)
+_DATE = re.compile(r"(?<!\d)\d{1,4}[-./]\d{1,2}[-./]\d{1,4}(?!\d)")
+_UNIT = re.compile(r"(\d+)\s*(h|hrs?|hours?|m|mins?|minutes?|s|secs?|seconds?)(?![a-z])\.?", re.I)
+_BULLET = re.compile(r"^\s*(?:[-*]\s+|#+\s*)")
+
+
+def _blank_dates(text: str) -> str:
+    """``text`` with dates overwritten by spaces; offsets are unchanged."""
+    return _DATE.sub(lambda m: " " * len(m.group()), text)
+
+
+def _seconds(segment: str, clock: bool = True):
+    """(seconds, label) for the first duration in ``segment``, or None.
+
+    ``clock``: also accept a bare ``m:ss``; without it only durations with a
+    unit count, since journal text is full of times of day.
+    """
+    text = _blank_dates(segment)
+    m = _CLOCK.search(text) if clock else None
+    if m:
+        secs = int(m.group(1)) * 60 + int(m.group(2))
+        label = segment[:m.start()] + segment[m.end():]
+    else:
+        secs, spans = 0, []
+        for m in _UNIT.finditer(text):
+            # only a run of adjacent units ("1m 30s") counts as one duration
+            if spans and text[spans[-1][1]:m.start()].strip():
+                break
+            unit = m.group(2)[0].lower()
+            secs += int(m.group(1)) * {"h": 3600, "m": 60, "s": 1}[unit]
+            spans.append(m.span())
+        if not spans:
+            return None
+        label = segment[:spans[0][0]] + segment[spans[-1][1]:]
+    if secs <= 0:
+        return None
+    return secs, " ".join(label.split())
+
+
+def parse_line(line: str) -> tuple:
+    """Steps for one workout line, e.g. ``5x 20s planche hold / 90s rest``.
+
+    ``/`` separates the intervals of one round; ``Nx`` repeats the round,
+    without the final rest. A bare ``m:ss`` only counts on a line that
+    starts with ``Nx`` or has a duration with a unit (``20s``, ``2 min``),
+    so "08:30 woke up" is not a workout. Lines with no duration give ``()``.
+    """
+    reps = 1
+    m = _REPS.match(line)
+    if m:
+        reps = max(1, int(m.group(1)))
+        line = line[m.end():]
+    line = _BULLET.sub("", line)
+    clock = m is not None or _UNIT.search(_blank_dates(line)) is not None
+    round_ = []
+    for segment in line.split("/"):
+        parsed = _seconds(segment, clock)
+        if parsed is None:
+            continue
+        secs, label = parsed
+        low = label.lower()
+        # an unlabelled interval after the work is the rest ("30s / 30s")
+        rest = (not label and bool(round_)) or any(w in low for w in REST_WORDS)
+        kind = "rest" if rest else "work"
+        round_.append(Step(label or kind, secs, kind))
+    if not round_:
+        return ()
+    steps = round_ * reps
+    while len(steps) > 1 and steps[-1].kind == "rest":
+        steps.pop()
+    return tuple(steps)
+
+
+def parse_paragraph(text: str):
+    """One Program for a paragraph with workout lines, else None.
+
+    The title is the paragraph's first line without a duration (a heading
+    such as ``# Push day``), or the first workout line itself.
+    """
+    steps, title = [], None
+    for line in text.split("\n"):
+        if not line.strip():
+            continue
+        parsed = parse_line(line)
+        if parsed:
+            steps.extend(parsed)
+            if title is None:
+                title = " ".join(_BULLET.sub("", line).split())
+        elif title is None or not steps:
+            title = " ".join(_BULLET.sub("", line).split())
+    if not steps:
+        return None
+    return Program(title, tuple(steps))
+
+
+class ProgramCache:
+    """Programs found in note bodies, parsed per paragraph.
+
+    Paragraphs are keyed by a hash of their text, so reopening a note, or
+    editing one paragraph of a long journal, only parses paragraphs not
+    seen before. Entries are shared across notes and evicted LRU.
+    """
+
+    def __init__(self, size: int = PARSE_CACHE_SIZE):
+        self.size = size
+        self._parsed = OrderedDict()    # digest -> Program or None
+        self.misses = 0
+
+    def programs(self, content: str) -> list:
+        out = []
+        for para in _PARAGRAPH.split(content):
+            if not para.strip():
+                continue
+            key = blake2b(para.encode("utf-8"), digest_size=16).digest()
+            if key in self._parsed:
+                self._parsed.move_to_end(key)
+                program = self._parsed[key]
+            else:
+                self.misses += 1
+                program = self._parsed[key] = parse_paragraph(para)
+                if len(self._parsed) > self.size:
+                    self._parsed.popitem(last=False)
+            if program is not None:
+                out.append(program)
+        return out
+
+
+class ProgramRunner:
+    """Plays a Program's steps back to back on a ``Countdown`` engine.
+
+    The owner calls ``advance()`` from the countdown's ``on_finish``.
+    """
+
+    def __init__(self, countdown):
+        self.countdown = countdown
+        self.program = None
+        self.index = 0
+
+    @property
+    def step(self):
+        if self.program is None:
+            return None
+        return self.program.steps[self.index]
+
+    def start(self, program) -> bool:
+        self.program, self.index = program, 0
+        return self.countdown.start(program.steps[0].seconds)
+
+    def advance(self) -> bool:
+        """Start the next step; False once the program is done."""
+        if self.program is None:
+            return False
+        if self.index + 1 >= len(self.program.steps):
+            self.program = None
+            return False
+        self.index += 1
+        return self.countdown.start(self.step.seconds)
+
+    def stop(self):
+        self.program = None
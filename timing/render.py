@@ -0,0 +1,207 @@
+# =============================
+# timing/render.py
+# =============================
+"""Offline rendering of click tracks and interval sessions to WAV.
+
+Kivy-free and independent of the realtime audio path. Cues are
+synthesised once into int16 buffers; the session is written in fixed-size
+chunks that start as zeroed bytes, with every cue copied in by slice
+assignment, so memory stays constant whatever the length. Cues that
+overlap (an accent under an end-of-step beep) are mixed once per distinct
+overlap pattern and cached.
+
+    python -m timing.render metronome --bpm 120 --minutes 60 click.wav
+    python -m timing.render program "5x 20s hold / 90s rest" session.wav
+"""
+import argparse
+import heapq
+import math
+import sys
+import wave
+from array import array
+from time import perf_counter
+
+SAMPLE_RATE = 44100
+CHUNK_SECONDS = 1.0
+SAMPLE_BYTES = 2                # mono int16
+MIX_CACHE_SIZE = 256            # distinct overlap patterns kept (a few MB at most)
+
+# cue name -> (freq Hz, length ms, volume); the same sounds the app plays
+CUES = {
+    "hi": (1200, 40, 0.35),     # accented click (rc_tick_hi.wav)
+    "lo": (800, 40, 0.35),      # click (rc_tick_lo.wav)
+    "beep": (900, 220, 0.45),   # countdown end (rc_timer_beep.wav)
+    "pip": (1000, 60, 0.30),    # 3-2-1 before a step ends
+}
+
+
+def tone(freq, ms, vol, sr=SAMPLE_RATE) -> bytes:
+    """Little-endian int16 sine burst with a raised-cosine envelope."""
+    frames = int(sr * ms / 1000.0)
+    out = array("h", bytes(frames * SAMPLE_BYTES))
+    for n in range(frames):
+        env = 0.5 * (1 - math.cos(2 * math.pi * (n / max(1, frames - 1))))
+        val = vol * env * math.sin(2 * math.pi * freq * n / sr)
+        out[n] = int(max(-1, min(1, val)) * 32767)
+    if sys.byteorder == "big":
+        out.byteswap()
+    return out.tobytes()
+
+
+def write_tone(path, freq, ms, vol, sr=SAMPLE_RATE):
+    """Write one cue as a WAV file (what the app loads with SoundLoader)."""
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(SAMPLE_BYTES)
+        wf.setframerate(sr)
+        wf.writeframes(tone(freq, ms, vol, sr))
+
+
+# ---------- Event streams: (seconds, cue name), in time order ----------
+def metronome_events(bpm, seconds, accent=2):
+    """Clicks on a fixed grid; every ``accent``-th beat (from the first) is "hi"."""
+    interval = 60.0 / max(1, bpm)
+    for i in range(int(seconds / interval) + 1):
+        t = i * interval
+        if t >= seconds:
+            return
+        yield t, "hi" if accent and i % accent == 0 else "lo"
+
+
+def program_events(program, pips=3):
+    """A beep when each step ends, and ``pips`` one-second pips before it."""
+    t = 0.0
+    for step in program.steps:
+        end = t + step.seconds
+        if step.seconds > pips + 1:
+            for k in range(pips, 0, -1):
+                yield end - k, "pip"
+        yield end, "beep"
+        t = end
+
+
+def merge_events(*streams):
+    """Interleave time-ordered event streams lazily."""
+    return heapq.merge(*streams, key=lambda e: e[0])
+
+
+class SessionRenderer:
+    """Streams an event list to a WAV file in constant memory."""
+
+    def __init__(self, sr=SAMPLE_RATE, chunk_seconds=CHUNK_SECONDS, cues=CUES):
+        self.sr = sr
+        self.chunk_frames = int(sr * chunk_seconds)
+        self._cues = {name: tone(*spec, sr=sr) for name, spec in cues.items()}
+        self._mixed = {}    # ((name, offset), ...) -> mixed int16 bytes
+
+    def _mix(self, key) -> bytes:
+        """Sum overlapping cues (key: (name, sample offset) pairs), clipped."""
+        mixed = self._mixed.get(key)
+        if mixed is None:
+            length = max(off + len(self._cues[n]) // SAMPLE_BYTES for n, off in key)
+            acc = [0] * length
+            for name, off in key:
+                cue = array("h", self._cues[name])
+                if sys.byteorder == "big":
+                    cue.byteswap()
+                for i, v in enumerate(cue, off):
+                    acc[i] += v
+            out = array("h", (max(-32768, min(32767, v)) for v in acc))
+            if sys.byteorder == "big":
+                out.byteswap()
+            if len(self._mixed) >= MIX_CACHE_SIZE:
+                del self._mixed[next(iter(self._mixed))]   # oldest first
+            mixed = self._mixed[key] = out.tobytes()
+        return mixed
+
+    def _groups(self, events):
+        """(start frame, bytes) for each run of overlapping cues, in order."""
+        sr, cues = self.sr, self._cues
+        group, g_start, g_end = [], 0, -1
+        for t, name in events:
+            start = round(t * sr)
+            end = start + len(cues[name]) // SAMPLE_BYTES
+            if group and start < g_end:
+                group.append((name, start - g_start))
+                g_end = max(g_end, end)
+                continue
+            if group:
+                yield g_start, self._flush(group)
+            group, g_start, g_end = [(name, 0)], start, end
+        if group:
+            yield g_start, self._flush(group)
+
+    def _flush(self, group):
+        if len(group) == 1:
+            return self._cues[group[0][0]]
+        return self._mix(tuple(group))
+
+    def render(self, path, events, seconds) -> dict:
+        """Write ``seconds`` of audio with ``events`` to ``path``."""
+        t0 = perf_counter()
+        total = int(round(seconds * self.sr))
+        groups = self._groups(events)
+        pending = []            # (start, bytes) reaching into the current chunk
+        upcoming = next(groups, None)
+        with wave.open(path, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(SAMPLE_BYTES)
+            wf.setframerate(self.sr)
+            for c0 in range(0, total, self.chunk_frames):
+                c1 = min(total, c0 + self.chunk_frames)
+                while upcoming is not None and upcoming[0] < c1:
+                    pending.append(upcoming)
+                    upcoming = next(groups, None)
+                chunk = bytearray((c1 - c0) * SAMPLE_BYTES)
+                keep = []
+                for start, buf in pending:
+                    end = start + len(buf) // SAMPLE_BYTES
+                    lo, hi = max(start, c0), min(end, c1)
+                    if lo < hi:
+                        chunk[(lo - c0) * SAMPLE_BYTES:(hi - c0) * SAMPLE_BYTES] = \
+                            buf[(lo - start) * SAMPLE_BYTES:(hi - start) * SAMPLE_BYTES]
+                    if end > c1:
+                        keep.append((start, buf))
+                pending = keep
+                wf.writeframesraw(chunk)
+        return {"seconds": seconds, "frames": total,
+                "bytes": total * SAMPLE_BYTES, "wall": perf_counter() - t0}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m timing.render",
+                                     description="Render a session to WAV.")
+    sub = parser.add_subparsers(dest="kind", required=True)
+    met = sub.add_parser("metronome", help="click track")
+    met.add_argument("--bpm", type=int, default=60)
+    met.add_argument("--accent", type=int, default=2, help="accent every N beats (0: none)")
+    met.add_argument("--minutes", type=float, default=10.0)
+    prog = sub.add_parser("program", help="interval session from workout text")
+    prog.add_argument("text", help='e.g. "5x 20s planche hold / 90s rest"')
+    prog.add_argument("--bpm", type=int, default=0, help="add a click track")
+    for p in (met, prog):
+        p.add_argument("--rate", type=int, default=SAMPLE_RATE)
+        p.add_argument("out")
+    args = parser.parse_args(argv)
+
+    if args.kind == "metronome":
+        seconds = args.minutes * 60
+        events = metronome_events(args.bpm, seconds, args.accent)
+    else:
+        from timing.programs import parse_paragraph
+        program = parse_paragraph(args.text.replace("\\n", "\n"))
+        if program is None:
+            print("no timed intervals found", file=sys.stderr)
+            return 1
+        seconds = program.total_seconds + 1.0   # let the last beep ring out
+        events = program_events(program)
+        if args.bpm:
+            events = merge_events(events, metronome_events(args.bpm, seconds))
+    stats = SessionRenderer(sr=args.rate).render(args.out, events, seconds)
+    print(f"{args.out}: {stats['seconds'] / 60:.1f} min, {stats['bytes'] / 1e6:.1f} MB "
+          f"in {stats['wall']:.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
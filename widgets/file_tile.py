@@ -2,10 +2,14 @@
 # widgets/file_tile.py
 # =============================
 from kivymd.uix.card import MDCard
-from kivy.properties import StringProperty
+from kivy.properties import BooleanProperty, StringProperty
 
 
 class FileTile(MDCard):
     item_id = StringProperty("")
     icon_name = StringProperty("file-document-outline")
     caption = StringProperty("")
+    snippet = StringProperty("")    # first words of the note body
+    meta = StringProperty("")       # "123 words · 14 Mar" / "4 items"
+    thumb = StringProperty("")      # thumbnail PNG of the note's first image, once made
+    selected = BooleanProperty(False)
@@ -0,0 +1,56 @@
+# =============================
+# widgets/markdown_view.py
+# =============================
+from kivy.properties import ObjectProperty
+from kivy.uix.label import Label
+from kivy.uix.recycleview import RecycleView
+from kivy.utils import escape_markup
+from pygments.styles import get_style_by_name
+
+STYLE = get_style_by_name("monokai")
+_tags = {}  # token type -> (open, close) markup
+
+
+def _tag(ttype):
+    tag = _tags.get(ttype)
+    if tag is None:
+        st = STYLE.style_for_token(ttype)
+        opening, closing = "", ""
+        if st["color"]:
+            opening, closing = f"[color={st['color']}]", "[/color]"
+        if st["bold"]:
+            opening, closing = opening + "[b]", "[/b]" + closing
+        if st["italic"]:
+            opening, closing = opening + "[i]", "[/i]" + closing
+        tag = _tags[ttype] = (opening, closing)
+    return tag
+
+
+def to_markup(tokens) -> str:
+    parts = []
+    for ttype, value in tokens:
+        opening, closing = _tag(ttype)
+        parts.append(opening + escape_markup(value) + closing)
+    return "".join(parts)
+
+
+class MarkdownLine(Label):
+    """One highlighted line; markup is built only when RecycleView shows it."""
+    tokens = ObjectProperty(())
+
+    def on_tokens(self, *_):
+        self.text = to_markup(self.tokens)
+
+
+class MarkdownView(RecycleView):
+    """Read-only highlighted note, one recycled row per line.
+
+    Rows come from editor.highlight as token tuples; only the rows on
+    screen ever become widgets or markup.
+    """
+
+    def show_rows(self, rows):
+        self.data = [{"tokens": t} for t in rows]
+
+    def splice(self, first: int, old_end: int, rows):
+        self.data[first:old_end] = [{"tokens": t} for t in rows]
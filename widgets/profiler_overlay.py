@@ -0,0 +1,41 @@
+# =============================
+# widgets/profiler_overlay.py
+# =============================
+from kivy.clock import Clock
+from kivy.graphics import Color, Rectangle
+from kivy.metrics import dp
+from kivy.uix.label import Label
+
+
+class ProfilerOverlay(Label):
+    """Top callbacks by self time per frame, refreshed twice a second."""
+
+    def __init__(self, profiler, **kwargs):
+        kwargs.setdefault("size_hint", (None, None))
+        kwargs.setdefault("font_size", "10sp")
+        kwargs.setdefault("font_name", "RobotoMono-Regular")
+        kwargs.setdefault("halign", "left")
+        kwargs.setdefault("valign", "top")
+        super().__init__(**kwargs)
+        self.profiler = profiler
+        self.bind(texture_size=self._fit)
+        with self.canvas.before:
+            Color(0, 0, 0, 0.7)
+            self._bg = Rectangle(pos=self.pos, size=self.size)
+        self.bind(pos=self._sync_bg, size=self._sync_bg)
+        Clock.schedule_interval(self.refresh, 0.5)
+
+    def _fit(self, *_):
+        self.size = (self.texture_size[0] + dp(8), self.texture_size[1] + dp(8))
+        if self.parent:
+            self.top = self.parent.height
+
+    def _sync_bg(self, *_):
+        self._bg.pos = self.pos
+        self._bg.size = self.size
+
+    def refresh(self, *_):
+        lines = [f"frame {self.profiler.last_frame_ms():5.1f} ms   ms/frame  worst"]
+        for label, per_frame, worst, _calls in self.profiler.frame_totals():
+            lines.append(f"{label[-28:]:<28} {per_frame:6.2f} {worst:6.1f}")
+        self.text = "\n".join(lines)